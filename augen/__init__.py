@@ -8,17 +8,26 @@ sub-modules.
 
 from . import utils
 from .beamer import *
+from .cache import *
 from .data import *
 from .dummies import *
+from .lazy import *
 
 __all__ = [
     # Classes
     "DummyPowerSpectra",
+    "DummySteeringVector",
     "SimpleBeamer",
     "EasyBeamer",
     "AmietDataReader",
     "AmietDataGenerator",
+    "AmietMultiArrayGenerator",
+    "AmietSweepGenerator",
+    "AmietDataCache",
     "AmietFrequencyData",
+    "LazyArray",
+    # Functions
+    "convert_to_v2",
 ]
 
 __author__ = "Michael Markus Ackermann"
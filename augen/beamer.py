@@ -5,6 +5,7 @@ Classes for beamforming with Acoular using Amiet Tools data.
 @Author: Michael Markus Ackermann
 """
 
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import List
 
@@ -18,10 +19,11 @@ from acoular import (
     MicGeom,
     RectGrid,
     SamplesGenerator,
-    SteeringVector,
 )
+from numpy import asarray, ndarray
 
-from .dummies import DummyPowerSpectra
+from .dummies import DummyPowerSpectra, DummySteeringVector
+from .utils import beamforming_map
 
 
 @dataclass
@@ -57,7 +59,8 @@ class __BasicBeamer:
 
     def _init_power_spectra(self, frequency, bsize, chnumber, csm) -> DummyPowerSpectra:
         """Initializes the cross spectral matrix (CSM) based on the instance
-        giving attributes.
+        giving attributes. Lazy CSMs (LazyArray) are loaded, as Acoular needs
+        the full array.
 
         Returns:
             DummyPowerSpectra: A dummy object based on acoular.PowerSpectra.
@@ -65,7 +68,10 @@ class __BasicBeamer:
         time_dummy = self._init_time_dummy(frequency, bsize, chnumber)
 
         ps = DummyPowerSpectra(
-            time_data=time_dummy, csm=csm, numchannels=chnumber, block_size=bsize
+            time_data=time_dummy,
+            csm=asarray(csm),
+            numchannels=chnumber,
+            block_size=bsize,
         )
         ps.ind_high = 2
         ps.ind_low = 1
@@ -73,18 +79,61 @@ class __BasicBeamer:
 
     def _init_steering_vector(self, steering_vector):
         """Initializes the steering vector based on the instance
-        giving attributes.
+        giving attributes. Lazy steering vectors (LazyArray) are loaded, as
+        Acoular needs the full array; only get_tiled_beamforming works on them
+        tile by tile.
+
+        Raises:
+            ValueError: If the steering vector and the grid don't have the same
+                number of scan points (e.g. data read with a region of interest
+                and the full grid).
 
         Returns:
             DummySteeringVector: A dummy object based on acoular.SteeringVector.
         """
-        st_vec = steering_vector
+        if steering_vector.shape[0] != self.grid.size:
+            raise ValueError(
+                f"The steering vector has {steering_vector.shape[0]} scan points, "
+                f"but the grid has {self.grid.size}. Use the grid of the reader "
+                "the data came from (cropped to its region of interest)."
+            )
+        return DummySteeringVector(
+            grid=self.grid, mics=self.array, steering_vector=asarray(steering_vector)
+        )
+
+    def _scan_map(self, pressure: ndarray) -> ndarray:
+        """Arranges a beamforming result as a map of the scan grid. The scan
+        points of amiet_tools (and of the steering vectors) are ordered row by
+        row, with x varying fastest, so the map has one row per y value. For
+        square grids it's the array returned by Acoular.
+
+        Args:
+            pressure (ndarray): Result of the beamformer, with the shape of
+                self.grid.
+
+        Returns:
+            ndarray: Map with shape (number of y values, number of x values).
+        """
+        return pressure.reshape(self.grid.shape[::-1])
 
-        class TempDummySteeringVector(SteeringVector):
-            def steer_vector(self, f, ind=None):
-                return st_vec
+    def _tiled_map(
+        self, csm: ndarray, steering_vector: ndarray, tile_size: int
+    ) -> List[float]:
+        """Calculates the delay-and-sum beamforming map in tiles of scan
+        points, see utils.beamforming_map.
 
-        return TempDummySteeringVector(grid=self.grid, mics=self.array)
+        Args:
+            csm (np.ndarray or LazyArray): CSM, with shape (2, M, M).
+            steering_vector (np.ndarray or LazyArray): Steering vector, with
+                shape (N, M).
+            tile_size (int): Number of scan points of each tile.
+
+        Returns:
+            List[float]: The sound pressure level, ready for plotting.
+        """
+        pressure = beamforming_map(csm[1], steering_vector, tile_size, self.remove_diag)
+        pressure_level = L_p(pressure / pressure.max()) + self.modifier
+        return pressure_level.reshape(self.grid.shape[::-1])
 
     def _init_grid(self, grid) -> RectGrid:
         """Initializes the rectangular grid. Currently only supports
@@ -193,11 +242,28 @@ class SimpleBeamer(__BasicBeamer):
             steer=self.steering_vector,
             r_diag=self.remove_diag,
         )
-        pressure = base.synthetic(self.frequency, n)
+        pressure = self._scan_map(base.synthetic(self.frequency, n))
         # Normalizing by the maxium value and adding a modifier (if needed)
         pressure_level = L_p(pressure / pressure.max()) + self.modifier
         return pressure_level
 
+    def get_tiled_beamforming(self, tile_size: int = 4096) -> List[float]:
+        """Gets the beamforming using the basic delay-and-sum algorithm,
+        calculated in tiles of scan points without Acoular. With data from a
+        lazy AmietDataReader, only one tile of the steering vector is loaded
+        at a time.
+
+        Observation: Only for the single frequency line.
+
+        Args:
+            tile_size (int, optional): Number of scan points of each tile.
+                Defaults to 4096.
+
+        Returns:
+            List[float]: The sound pressure level, ready for plotting.
+        """
+        return self._tiled_map(self.data.csm, self.data.steering_vector, tile_size)
+
     def get_damas(self, iter: int = 100, n: int = 1):
         """Gets the DAMAS deconvolution.
 
@@ -221,7 +287,7 @@ class SimpleBeamer(__BasicBeamer):
         """
         base = self.get_beamforming(n)
         damas = BeamformerDamas(beamformer=base, n_iter=iter)
-        pressure = damas.synthetic(self.frequency, n)
+        pressure = self._scan_map(damas.synthetic(self.frequency, n))
         pressure_level = L_p(pressure / pressure.max()) + self.modifier
         return pressure_level
 
@@ -252,7 +318,7 @@ class SimpleBeamer(__BasicBeamer):
             r_diag=self.remove_diag,
             n=num,
         )
-        pressure = eig.synthetic(self.frequency, n)
+        pressure = self._scan_map(eig.synthetic(self.frequency, n))
         pressure_level = L_p(pressure / pressure.max()) + self.modifier
         return pressure_level
 
@@ -280,7 +346,7 @@ class SimpleBeamer(__BasicBeamer):
         base = BeamformerMusic(
             freq_data=self.power_spectra, steer=self.steering_vector, n=nsources
         )
-        pressure = base.synthetic(self.frequency, n)
+        pressure = self._scan_map(base.synthetic(self.frequency, n))
         # Normalizing by the max value
         pressure_level = L_p(pressure / pressure.max()) + self.modifier
         return pressure_level
@@ -310,7 +376,7 @@ class SimpleBeamer(__BasicBeamer):
             steer=self.steering_vector,
             r_diag=self.remove_diag,
         )
-        pressure = base.synthetic(self.frequency, n)
+        pressure = self._scan_map(base.synthetic(self.frequency, n))
         # Normalizing by the max value
         pressure_level = L_p(pressure / pressure.max()) + self.modifier
         return pressure_level
@@ -330,6 +396,11 @@ class EasyBeamer(__BasicBeamer):
             beamformings. Defaults to False.
         modifier (int, optional): Modifier to help with the pressure level
             normalization. Defaults to 0.
+        cache_bytes (int, optional): Memory budget, in bytes, of the Acoular
+            objects (power spectra, steering vector and base beamformers, with
+            their result arrays) prepared for each frequency, which are reused
+            by the next calls for the same frequency. The least recently used
+            frequencies are dropped to fit the budget. Defaults to 256 MiB.
 
     Returns:
         EasyBeamer instance.
@@ -341,8 +412,10 @@ class EasyBeamer(__BasicBeamer):
         block_size: int = 128,
         remove_diag: bool = False,
         modifier: float = 0,
+        cache_bytes: int = 256 * 2**20,
     ) -> None:
         self.data = data
+        self.cache_bytes = cache_bytes
         super().__init__(block_size, remove_diag, modifier)
         self.__post_init__()
 
@@ -354,29 +427,51 @@ class EasyBeamer(__BasicBeamer):
         """
 
         self.frequencies = self.data.frequencies
+        self.index = self.data.index
         self.grid = self._init_grid(self.data.get_grid())
         self.array = MicGeom(mpos_tot=self.data.get_mic_array()[1])
+        # Prepared Acoular objects, {position: {name: object}}, in LRU order.
+        self._prepared = OrderedDict()
+        self._prepared_size = 0
         return None
 
     def __init_frequency_data(self, frequency: float) -> None:
         """Initializes the power spectra and steering vector for Acoular after
             the frequency data is extracted as an AmietFrequencyData instance.
+            The objects prepared for a frequency are reused while they're
+            cached.
 
         Args:
             frequency (float): Frequency to extract the data. Defaults to None.
         """
 
-        if frequency in self.frequencies:
-            freq_data = self.data.get_frequency_data(frequency)
-            self._power_spectra = self._init_power_spectra(
-                freq_data.frequency,
-                self.block_size,
-                self.array.num_mics,
-                freq_data.csm,
-            )
-            self._steering_vector = self._init_steering_vector(
-                freq_data.steering_vector
-            )
+        if frequency in self.index:
+            position = self.index.lookup(frequency)
+            prepared = self._prepared.get(position)
+            if prepared is None:
+                freq_data = self.data.get_frequency_data(frequency)
+                prepared = {
+                    "power_spectra": self._init_power_spectra(
+                        freq_data.frequency,
+                        self.block_size,
+                        self.array.num_mics,
+                        freq_data.csm,
+                    ),
+                    "steering_vector": self._init_steering_vector(
+                        freq_data.steering_vector
+                    ),
+                    # BeamformerBase by remove_diag, its results are reused.
+                    "base": {},
+                    "bytes": freq_data.steering_vector.nbytes + freq_data.csm.nbytes,
+                }
+                self.__cache_prepared(position, prepared)
+            else:
+                self._prepared.move_to_end(position)
+            self._current = prepared
+            # Stored value of the frequency, for Acoular's frequency bands.
+            self._frequency = self.frequencies[position]
+            self._power_spectra = prepared["power_spectra"]
+            self._steering_vector = prepared["steering_vector"]
         else:
             raise ValueError(
                 f"""The given `frequency` isn\'t in the
@@ -385,6 +480,94 @@ class EasyBeamer(__BasicBeamer):
             )
         return None
 
+    def __cache_prepared(self, position: int, prepared: dict) -> None:
+        """Adds the objects prepared for a frequency to the cache, dropping
+        the least recently used ones until it fits in self.cache_bytes.
+
+        Args:
+            position (int): Position of the frequency in self.frequencies.
+            prepared (dict): Objects prepared for the frequency.
+
+        Returns:
+            None.
+        """
+        if prepared["bytes"] > self.cache_bytes:
+            return None
+        self._prepared[position] = prepared
+        self._prepared_size += prepared["bytes"]
+        self.__fit_prepared()
+        return None
+
+    def __grow_prepared(self, size: int) -> None:
+        """Adds the size of an object created after the frequency was cached
+        (a base beamformer and its results) to the objects prepared for the
+        current frequency, dropping the least recently used frequencies until
+        they fit in self.cache_bytes again.
+
+        Args:
+            size (int): Size of the new object, in bytes.
+
+        Returns:
+            None.
+        """
+        self._current["bytes"] += size
+        if any(prepared is self._current for prepared in self._prepared.values()):
+            self._prepared_size += size
+            self.__fit_prepared()
+        return None
+
+    def __fit_prepared(self) -> None:
+        """Drops the least recently used prepared objects until they fit in
+        self.cache_bytes.
+
+        Returns:
+            None.
+        """
+        while self._prepared and self._prepared_size > self.cache_bytes:
+            _, dropped = self._prepared.popitem(last=False)
+            self._prepared_size -= dropped["bytes"]
+        return None
+
+    def clear_cache(self, frequency: float = None) -> None:
+        """Drops the Acoular objects prepared for a frequency, or for all of
+        them (e.g. after the data file is changed).
+
+        Args:
+            frequency (float, optional): Frequency to be dropped. Defaults to
+                None (all the frequencies).
+
+        Returns:
+            None.
+        """
+        if frequency is None:
+            self._prepared.clear()
+            self._prepared_size = 0
+        else:
+            dropped = self._prepared.pop(self.index.lookup(frequency), None)
+            if dropped is not None:
+                self._prepared_size -= dropped["bytes"]
+        return None
+
+    def __base_beamformer(self) -> BeamformerBase:
+        """Base beamformer of the current frequency. It's shared by
+        self.get_beamforming() and self.get_damas(), so the DAMAS of a
+        frequency already beamformed reuses its result.
+
+        Returns:
+            acoular.BeamformerBase: Base beamformer.
+        """
+        bases = self._current["base"]
+        if self.remove_diag not in bases:
+            bases[self.remove_diag] = BeamformerBase(
+                freq_data=self._power_spectra,
+                steer=self._steering_vector,
+                r_diag=self.remove_diag,
+            )
+            # Results kept by the beamformer, one float64 map per frequency
+            # line of the power spectra.
+            self.__grow_prepared((self.block_size // 2 + 1) * self.grid.size * 8)
+        return bases[self.remove_diag]
+
     def get_beamforming(self, frequency: float = None, n: int = 1) -> List[float]:
         """Gets the beamforming using the basic delay-and-sum algorithm in the frequency domain.
 
@@ -407,16 +590,41 @@ class EasyBeamer(__BasicBeamer):
             List[float]: The sound pressure level, ready for plotting.
         """
         self.__init_frequency_data(frequency)
-        base = BeamformerBase(
-            freq_data=self._power_spectra,
-            steer=self._steering_vector,
-            r_diag=self.remove_diag,
-        )
-        pressure = base.synthetic(frequency, n)
+        base = self.__base_beamformer()
+        pressure = self._scan_map(base.synthetic(self._frequency, n))
         # Normalizing by the max value
         pressure_level = L_p(pressure / pressure.max()) + self.modifier
         return pressure_level
 
+    def get_tiled_beamforming(
+        self, frequency: float = None, tile_size: int = 4096
+    ) -> List[float]:
+        """Gets the beamforming using the basic delay-and-sum algorithm,
+        calculated in tiles of scan points without Acoular. With a lazy
+        AmietDataReader, only one tile of the steering vector is loaded at a
+        time.
+
+        Observation: Only for the single frequency line.
+
+        Args:
+            frequency (float): Frequency. Defaults to None.
+            tile_size (int, optional): Number of scan points of each tile.
+                Defaults to 4096.
+
+        Raises:
+            ValueError: If the frequency isn't in the data file.
+
+        Returns:
+            List[float]: The sound pressure level, ready for plotting.
+        """
+        if frequency not in self.index:
+            raise ValueError(
+                f"The given `frequency` isn't in the available frequencies: "
+                f"{self.frequencies}."
+            )
+        freq_data = self.data.get_frequency_data(frequency)
+        return self._tiled_map(freq_data.csm, freq_data.steering_vector, tile_size)
+
     def get_damas(self, frequency: float = None, iter: int = 100, n: int = 1):
         """Gets the DAMAS deconvolution.
 
@@ -440,13 +648,9 @@ class EasyBeamer(__BasicBeamer):
             List[float]: The sound pressure level, ready for plotting.
         """
         self.__init_frequency_data(frequency)
-        base = BeamformerBase(
-            freq_data=self._power_spectra,
-            steer=self._steering_vector,
-            r_diag=self.remove_diag,
-        )
+        base = self.__base_beamformer()
         damas = BeamformerDamas(beamformer=base, n_iter=iter)
-        pressure = damas.synthetic(frequency, n)
+        pressure = self._scan_map(damas.synthetic(self._frequency, n))
         pressure_level = L_p(pressure / pressure.max()) + self.modifier
         return pressure_level
 
@@ -479,7 +683,7 @@ class EasyBeamer(__BasicBeamer):
             r_diag=self.remove_diag,
             n=num,
         )
-        pressure = eig.synthetic(frequency, n)
+        pressure = self._scan_map(eig.synthetic(self._frequency, n))
         pressure_level = L_p(pressure / pressure.max()) + self.modifier
         return pressure_level
 
@@ -509,7 +713,7 @@ class EasyBeamer(__BasicBeamer):
         base = BeamformerMusic(
             freq_data=self._power_spectra, steer=self._steering_vector, n=nsources
         )
-        pressure = base.synthetic(frequency, n)
+        pressure = self._scan_map(base.synthetic(self._frequency, n))
         # Normalizing by the max value
         pressure_level = L_p(pressure / pressure.max()) + self.modifier
         return pressure_level
@@ -541,7 +745,7 @@ class EasyBeamer(__BasicBeamer):
             steer=self._steering_vector,
             r_diag=self.remove_diag,
         )
-        pressure = base.synthetic(frequency, n)
+        pressure = self._scan_map(base.synthetic(self._frequency, n))
         # Normalizing by the max value
         pressure_level = L_p(pressure / pressure.max()) + self.modifier
         return pressure_level
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of generated AmietData files
+=================
+@Author: Michael Markus Ackermann
+"""
+
+from copy import copy
+from dataclasses import dataclass
+from hashlib import sha256
+from json import dump, load
+from os import makedirs, remove, replace
+from os.path import getsize, isfile, join
+from shutil import copyfile
+from time import time
+from typing import Dict, List
+
+from numpy import asarray, float64
+
+# AmietDataGenerator options that change the content of the data file.
+_CONTENT_OPTIONS = (
+    "csm_rank",
+    "csm_energy",
+    "csm_format",
+    "store_shear_layer",
+    "compression",
+    "compression_opts",
+    "shuffle",
+    "fletcher32",
+    "compact",
+    "layout",
+    "chunk_points",
+)
+
+
+@dataclass
+class AmietDataCache:
+    """Content-addressed cache of the files made by AmietDataGenerator. Each
+    file is named after a hash of the full effective configuration of the
+    generator (TestSetup, AirfoilGeom, microphone positions after the distance
+    override, scan grid, frequencies and content options), so the same
+    configuration is generated only once.
+
+    Args:
+        directory (str, optional): Folder of the cached files. Defaults to
+            'AmietDataCache'.
+        max_size (int, optional): Maximum size of the cached files, in bytes.
+            When exceeded, the least recently used files are removed. Defaults
+            to None (no limit).
+
+    Returns:
+        AmietDataCache instance.
+    """
+
+    directory: str = "AmietDataCache"
+    max_size: int = None
+
+    def __post_init__(self) -> None:
+        """Creates the cache folder, if it doesn't exist yet.
+
+        Returns:
+            None.
+        """
+        makedirs(self.directory, exist_ok=True)
+        self._index_file = join(self.directory, "index.json")
+        return None
+
+    def key(self, generator: object) -> str:
+        """Hashes the effective configuration of a generator.
+
+        Args:
+            generator (AmietDataGenerator): Generator to be hashed.
+
+        Returns:
+            str: Hexadecimal SHA-256 hash of the configuration.
+        """
+        h = sha256()
+        for group_name in sorted(generator._metadata):
+            datasets = generator._metadata[group_name]
+            for name in sorted(datasets):
+                value, dtype = datasets[name]
+                if dtype is None:
+                    # Only the name of the array file, doesn't change the data.
+                    continue
+                value = asarray(value, dtype=dtype)
+                h.update(f"{group_name}/{name}{value.shape}".encode())
+                h.update(value.tobytes())
+        h.update(asarray(generator._XYZ_airfoil, dtype=float64).tobytes())
+        h.update(asarray(generator.frequencies, dtype=float64).tobytes())
+        for option in _CONTENT_OPTIONS:
+            h.update(f"{option}={getattr(generator, option)!r}".encode())
+        return h.hexdigest()
+
+    def path(self, key: str) -> str:
+        """Path of the cached file of a configuration.
+
+        Args:
+            key (str): Configuration hash, from self.key().
+
+        Returns:
+            str: Path of the HDF5 file.
+        """
+        return join(self.directory, f"{key}.h5")
+
+    def get(self, generator: object, workers: int = None, link: bool = False) -> str:
+        """Returns the data file of a generator, running it only if its
+        configuration isn't cached yet. An interrupted generation is resumed on
+        the next call.
+
+        Args:
+            generator (AmietDataGenerator): Generator of the data.
+            workers (int, optional): Worker processes used on a miss, see
+                AmietDataGenerator.run(). Defaults to None.
+            link (bool, optional): If True, the cached file is also copied
+                to '{generator.data_name}.h5'. It's a copy, so later runs
+                writing to that file don't change the cached one. Defaults to
+                False.
+
+        Returns:
+            str: Path of the cached HDF5 file.
+        """
+        key = self.key(generator)
+        file_name = self.path(key)
+        index = self._load_index()
+        # A file changed outside the cache (different size) is resumed.
+        if (
+            key in index
+            and isfile(file_name)
+            and (getsize(file_name) == index[key]["size"])
+        ):
+            index[key]["last_used"] = time()
+            index[key]["hits"] += 1
+        else:
+            cached = copy(generator)
+            cached.data_name = file_name[:-3]
+            cached.mode = "resume"
+            cached.run(workers)
+            generator.timings = cached.timings
+            index[key] = {
+                "data_name": generator.data_name,
+                "size": getsize(file_name),
+                "created": time(),
+                "last_used": time(),
+                "hits": 0,
+            }
+        self._save_index(index)
+        self.evict(keep=key)
+        if link:
+            self._copy(file_name, f"{generator.data_name}.h5")
+        return file_name
+
+    def entries(self) -> List[Dict]:
+        """Lists the cached files, from the most to the least recently used.
+
+        Returns:
+            List[Dict]: Information of each entry: key, path, data_name (of
+                the generator that created it), size (bytes), created and
+                last_used (timestamps) and hits.
+        """
+        index = self._load_index()
+        entries = [
+            dict(key=key, path=self.path(key), **entry) for key, entry in index.items()
+        ]
+        return sorted(entries, key=lambda entry: entry["last_used"], reverse=True)
+
+    def size(self) -> int:
+        """Total size of the cached files.
+
+        Returns:
+            int: Size in bytes.
+        """
+        return sum(entry["size"] for entry in self._load_index().values())
+
+    def purge(self, keys: list = None) -> None:
+        """Removes cached files.
+
+        Args:
+            keys (list, optional): Keys of the entries to be removed. Defaults
+                to None, which removes all of them.
+
+        Returns:
+            None.
+        """
+        index = self._load_index()
+        for key in list(index) if keys is None else keys:
+            index.pop(key, None)
+            if isfile(self.path(key)):
+                remove(self.path(key))
+        self._save_index(index)
+        return None
+
+    def evict(self, keep: str = None) -> None:
+        """Removes the least recently used files until the cache fits in
+        self.max_size.
+
+        Args:
+            keep (str, optional): Key of an entry that must not be removed.
+                Defaults to None.
+
+        Returns:
+            None.
+        """
+        if self.max_size is None:
+            return None
+        index = self._load_index()
+        total = sum(entry["size"] for entry in index.values())
+        oldest = sorted(index, key=lambda key: index[key]["last_used"])
+        evicted = []
+        for key in oldest:
+            if total <= self.max_size:
+                break
+            if key != keep:
+                total -= index[key]["size"]
+                evicted.append(key)
+        if evicted:
+            self.purge(evicted)
+        return None
+
+    def _copy(self, source: str, destination: str) -> None:
+        """Makes the cached file available with another name, as an
+        independent copy.
+
+        Args:
+            source (str): Path of the cached file.
+            destination (str): New path.
+
+        Returns:
+            None.
+        """
+        if isfile(destination):
+            remove(destination)
+        copyfile(source, destination)
+        return None
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """Loads the index of the cached files.
+
+        Returns:
+            Dict[str, Dict]: Entries of the cache by key.
+        """
+        if not isfile(self._index_file):
+            return {}
+        with open(self._index_file, "r") as f:
+            return load(f)
+
+    def _save_index(self, index: Dict[str, Dict]) -> None:
+        """Saves the index of the cached files, replacing the old one only
+        after it's completely written.
+
+        Args:
+            index (Dict[str, Dict]): Entries of the cache by key.
+
+        Returns:
+            None.
+        """
+        with open(f"{self._index_file}.tmp", "w") as f:
+            dump(index, f, indent=2)
+        replace(f"{self._index_file}.tmp", self._index_file)
+        return None
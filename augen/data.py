@@ -5,9 +5,19 @@ Classes for handling data
 @Author: Michael Markus Ackermann
 """
 
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Tuple
+from functools import partial
+from itertools import chain, product
+from os import getpid
+from os.path import isfile
+from queue import Empty, Queue
+from threading import Event, Lock, Thread
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Tuple
 
 from acoular import RectGrid
 from amiet_tools import (
@@ -23,21 +33,72 @@ from amiet_tools import (
 )
 from h5py import File
 from numpy import (
+    allclose,
+    arange,
     array,
+    array_equal,
+    ascontiguousarray,
+    asarray,
     complex64,
     concatenate,
+    empty,
+    flatnonzero,
     float64,
     int64,
-    linalg,
+    matmul,
     ndarray,
     ones,
     pi,
+    s_,
+    sqrt,
     transpose,
+    unique,
     zeros,
-    zeros_like,
 )
 
-from .utils import index_of_value
+from .lazy import LazyArray
+from .utils import (
+    FrequencyIndex,
+    beamforming_filters,
+    dipole_shear_block,
+    low_rank_factor,
+    pack_hermitian,
+    unpack_hermitian,
+)
+
+# Generator instance used by the worker processes of a parallel run.
+_worker_generator = None
+
+
+def _init_worker(generator: object) -> None:
+    """Stores the AmietDataGenerator instance inside a worker process, so it's
+    sent only once per process instead of once per frequency.
+
+    Args:
+        generator (AmietDataGenerator): Generator with the frequency
+            independent steps already calculated.
+
+    Returns:
+        None.
+    """
+    global _worker_generator
+    _worker_generator = generator
+    return None
+
+
+def _compute_block(frequencies: list) -> Tuple[list, Dict[str, float]]:
+    """Calculates the data of a block of frequencies inside a worker process.
+
+    Args:
+        frequencies (list): Frequencies to be calculated.
+
+    Returns:
+        Tuple[list, Dict[str, float]]: AmietFrequencyData of each frequency,
+            and the time spent on each stage to calculate them.
+    """
+    _worker_generator.timings = {}
+    results = _worker_generator._compute_block(frequencies)
+    return (results, _worker_generator.timings)
 
 
 @dataclass
@@ -48,6 +109,11 @@ class AmietFrequencyData:
         frequency (float): Frequency of the data.
         steering_vector (ndarray): Steering vector.
         csm (ndarray): Cross spectral matrix.
+        csm_factor (ndarray, optional): Low-rank factor F of the cross spectral
+            matrix (csm[1] = F @ F^H), when it's generated in factorized mode.
+            Defaults to None.
+        captured_energy (float, optional): Fraction of the source CSM energy
+            kept by the low-rank factor. Defaults to None.
 
     Returns:
         AmietFrequencyData instance.
@@ -56,23 +122,238 @@ class AmietFrequencyData:
     frequency: float
     steering_vector: ndarray
     csm: ndarray
+    csm_factor: ndarray = None
+    captured_energy: float = None
 
     def __repr__(self) -> str:
         return f"AmietFrequencyData for {self.frequency} Hz."
 
 
+def _read_value(group: object, name: str) -> object:
+    """Reads a metadata value of a group, saved as an attribute or (by older
+    versions) as a dataset.
+
+    Args:
+        group (h5py.Group): Metadata group of the HDF5 file.
+        name (str): Name of the value.
+
+    Returns:
+        object: Stored value, or None if it isn't in the group.
+    """
+    if name in group.attrs:
+        return group.attrs[name]
+    if name in group:
+        return group[name][()]
+    return None
+
+
+def _layout_version(fd: object) -> int:
+    """Layout of the frequency data of an HDF5 file: 1 for one freq_i group
+    per frequency, 2 for datasets stacked along the frequencies.
+
+    Args:
+        fd (h5py.Group): 'Frequency data' group of the HDF5 file.
+
+    Returns:
+        int: Layout version.
+    """
+    return int(fd.attrs.get("layout_version", 1))
+
+
+def _storage_attributes(fd: object) -> Dict[str, object]:
+    """Storage options of the frequency data of an HDF5 file (compact and
+    csm_format of AmietDataGenerator). They're saved as attributes of the
+    group; in files written before that, they're found from the stored
+    datasets, when there are any. The layout is given by _layout_version().
+
+    Args:
+        fd (h5py.Group): 'Frequency data' group of the HDF5 file.
+
+    Returns:
+        Dict[str, object]: Known storage options, by name.
+    """
+    options = {}
+    if "compact" in fd.attrs and "csm_format" in fd.attrs:
+        csm_format = fd.attrs["csm_format"]
+        if isinstance(csm_format, bytes):
+            csm_format = csm_format.decode()
+        options.update(compact=bool(fd.attrs["compact"]), csm_format=str(csm_format))
+        return options
+    if _layout_version(fd) == 2:
+        group = fd
+    else:
+        names = [n for n in fd if n.startswith("freq_") and not n.endswith(".partial")]
+        group = fd.get(names[0]) if names else None
+    csm_names = ("CSM", "CSM_packed", "CSM_factor")
+    if group is None or not any(name in group for name in csm_names):
+        return options
+    options["compact"] = "steering_vector" not in group
+    if "CSM_packed" in group:
+        options["csm_format"] = "packed"
+    elif "CSM_factor" in group:
+        options["csm_format"] = "factor"
+    else:
+        options["csm_format"] = "full"
+    return options
+
+
+def _write_stacked(
+    fd: object, name: str, i: int, value: ndarray, options: Dict
+) -> None:
+    """Writes the value of the i-th frequency in a stacked (layout v2) dataset,
+    creating it or growing it to the size of the 'frequencies' index if
+    needed. The last axis also grows for wider values (e.g. CSM factors of a
+    larger rank), and narrower ones are padded with zeros.
+
+    Args:
+        fd (h5py.Group): 'Frequency data' group of the HDF5 file.
+        name (str): Name of the dataset.
+        i (int): Position of the frequency in the 'frequencies' index.
+        value (ndarray): Value of the frequency.
+        options (Dict): h5py storage options of the value of one frequency.
+
+    Returns:
+        None.
+    """
+    value = asarray(value)
+    F = fd.get("frequencies").shape[0]
+    ds = fd.get(name)
+    if ds is None:
+        options = dict(options)
+        options["chunks"] = (1,) + tuple(options.get("chunks", value.shape))
+        ds = fd.create_dataset(
+            name,
+            shape=(F,) + value.shape,
+            dtype=value.dtype,
+            maxshape=(None,) * (value.ndim + 1),
+            **options,
+        )
+    if ds.shape[0] < F:
+        ds.resize(F, axis=0)
+    if value.ndim and value.shape[-1] > ds.shape[-1]:
+        ds.resize(value.shape[-1], axis=value.ndim)
+    if value.ndim and value.shape[-1] < ds.shape[-1]:
+        padded = zeros(ds.shape[1:], dtype=ds.dtype)
+        padded[..., : value.shape[-1]] = value
+        value = padded
+    ds[i] = value
+    return None
+
+
+def _read_transposed(
+    dataset: object, position: int, out: ndarray, runs: List[Tuple[int, int]]
+) -> ndarray:
+    """Reads a steering vector, saved as (M, N), into a C-contiguous (n, M)
+    array, the layout used by the beamformers. Only the given runs of scan
+    points (columns) are read, as hyperslabs of at most 1024 columns (rounded
+    down to the chunks of the dataset when they are narrower), through a small
+    scratch buffer, so the full (M, N) array is never held in memory, whatever
+    the chunk shape of the dataset.
+
+    Args:
+        dataset (h5py.Dataset): Steering vector dataset, (M, N) in layout v1
+            or (F, M, N) in layout v2.
+        position (int): Position of the frequency in layout v2, or None.
+        out (ndarray): C-contiguous (n, M) array where the data is written.
+        runs (List[Tuple[int, int]]): Start and stop of each run of
+            consecutive columns to be read, n columns in total.
+
+    Returns:
+        ndarray: The out array.
+    """
+    M, N = dataset.shape[-2:]
+    block = min(1024, N)
+    chunk = dataset.chunks[-1] if dataset.chunks else block
+    if chunk < block:
+        block -= block % chunk
+    scratch = empty((M, block), dtype=dataset.dtype)
+    row = 0
+    for first, last in runs:
+        for start in range(first, last, block):
+            stop = min(start + block, last)
+            columns = (
+                s_[:, start:stop] if position is None else s_[position, :, start:stop]
+            )
+            dataset.read_direct(
+                scratch, source_sel=columns, dest_sel=s_[:, : stop - start]
+            )
+            out[row : row + stop - start] = scratch[:, : stop - start].T
+            row += stop - start
+    return out
+
+
+def _sub_runs(
+    runs: List[Tuple[int, int]], start: int, stop: int
+) -> List[Tuple[int, int]]:
+    """Runs of columns of the rows start:stop of a selection of columns made
+    of runs, e.g. the scan points of a block of a lazy steering vector.
+
+    Args:
+        runs (List[Tuple[int, int]]): Start and stop of each run of columns.
+        start (int): First row of the block.
+        stop (int): End of the block (not included).
+
+    Returns:
+        List[Tuple[int, int]]: Start and stop of each run of columns of the
+            block.
+    """
+    selected, offset = [], 0
+    for first, last in runs:
+        a, b = max(start - offset, 0), min(stop - offset, last - first)
+        if a < b:
+            selected.append((first + a, first + b))
+        offset += last - first
+    return selected
+
+
 @dataclass
 class AmietDataReader:
     """Class used to create object to extract the data contained in tha HDF5 file.
+    The file is kept open by the reader until self.close() is called (or the
+    end of a with block), and the metadata groups are read only once. After a
+    fork (e.g. multiprocessing) the file is opened again in the new process.
 
     Args:
         file_name (str): Name of the HDF5 file (with the directory location).
+        cache_bytes (int, optional): Memory budget, in bytes, of the cache of
+            the AmietFrequencyData returned by self.get_frequency_data(). The
+            least recently used frequencies are dropped to fit the budget,
+            and a frequency larger than it is never cached. The cached objects
+            are shared between calls, so their arrays shouldn't be changed.
+            Not used in lazy mode. Defaults to 0 (no cache).
+        roi (Tuple[float, float, float, float], optional): Region of interest
+            (x_min, x_max, y_min, y_max) of the scan grid, in meters. Only the
+            scan points inside it are read (and rebuilt, in compact files),
+            and self.get_grid() returns the grid cropped to it. Defaults to
+            None (full grid).
+        lazy (bool, optional): If True, the steering vector and the CSM of
+            the AmietFrequencyData returned by self.get_frequency_data() are
+            LazyArray proxies, which read only the indexed rows (scan points)
+            from the file, so blocks can be processed without loading the
+            full matrix (see utils.beamforming_map). Compact files rebuild
+            only the indexed scan points. Defaults to False.
+
+    Attributes:
+        frequencies (ndarray): Frequencies of the file.
+        index (FrequencyIndex): Sorted index of the frequencies, used to find
+            them with a tolerance, or the ones inside a frequency band.
+        timings (dict): Accumulated time (in seconds) spent rebuilding the
+            steering vectors of compact files ('steering_vector'), and by
+            self.iter_frequency_data() reading in the background
+            ('prefetch_read'), waiting for the data ('prefetch_wait') and the
+            reading time hidden behind the caller's work ('prefetch_hidden').
+        cache_hits (int): Frequencies returned from the cache.
+        cache_misses (int): Frequencies read from the file while the cache
+            is enabled.
 
     Returns:
         AmietDataReader instance.
     """
 
     file_name: str
+    cache_bytes: int = 0
+    roi: Tuple[float, float, float, float] = None
+    lazy: bool = False
 
     def __post_init__(self) -> None:
         """Post initializes the object to avoid conceptual OOP errors.
@@ -81,7 +362,23 @@ class AmietDataReader:
             None.
         """
 
+        self._hdf = None
+        self._pid = None
+        # Values of the metadata groups and objects built from them.
+        self._metadata = {}
+        self._objects = {}
         self.frequencies = self.__extract_frequencies()
+        self.index = FrequencyIndex(self.frequencies)
+        self.timings = {}
+        # Geometry used to rebuild the steering vectors of compact files.
+        self._steering_geometry = None
+        # LRU cache of frequency data, {position: (AmietFrequencyData, bytes)}.
+        self._cache = OrderedDict()
+        self._cache_size = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Guards the cache, shared with the prefetching thread.
+        self._lock = Lock()
         return None
 
     def __extract_frequencies(self):
@@ -90,36 +387,557 @@ class AmietDataReader:
         Returns:
             frequencies: List of frequencies inside the group.
         """
-        file_instance = File(self.file_name, "r")
-        fq = file_instance.get("Frequency data")
+        fq = self.__file().get("Frequency data")
         frequencies = fq.get("frequencies")[()]
-        file_instance.close()
+        self._layout = _layout_version(fq)
 
         return frequencies
 
+    def __file(self) -> File:
+        """Opened HDF5 file. It's opened on the first use, and again in a
+        forked process, since HDF5 handles can't be shared between processes.
+
+        Returns:
+            h5py.File: Opened HDF5 file.
+        """
+        if self._hdf is None or self._pid != getpid():
+            self._hdf = File(self.file_name, "r")
+            self._pid = getpid()
+        return self._hdf
+
+    def __metadata(self, group_name: str) -> Dict[str, object]:
+        """Values of a metadata group, saved as attributes or (by older
+        versions) as datasets. Each group is read only once.
+
+        Args:
+            group_name (str): Name of the group.
+
+        Returns:
+            Dict[str, object]: Values by name.
+        """
+        if group_name not in self._metadata:
+            group = self.__file().get(group_name)
+            values = {name: group[name][()] for name in group}
+            values.update(group.attrs)
+            self._metadata[group_name] = values
+        return self._metadata[group_name]
+
+    def close(self) -> None:
+        """Closes the HDF5 file. It's opened again if the reader is used
+        after that.
+
+        Returns:
+            None.
+        """
+        hdf = getattr(self, "_hdf", None)
+        if hdf is not None and self._pid == getpid():
+            hdf.close()
+        self._hdf = None
+        return None
+
+    def __enter__(self) -> object:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+        return None
+
+    def __del__(self) -> None:
+        self.close()
+        return None
+
+    def __getstate__(self) -> Dict:
+        # The HDF5 handle can't be pickled, it's opened again when needed.
+        state = self.__dict__.copy()
+        state["_hdf"], state["_pid"] = None, None
+        state["_cache"], state["_cache_size"] = OrderedDict(), 0
+        state["_lock"] = None
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self._lock = Lock()
+        return None
+
+    def clear_cache(self) -> None:
+        """Drops all the cached frequency data and resets the counters.
+
+        Returns:
+            None.
+        """
+        self._cache.clear()
+        self._cache_size = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        return None
+
+    def __cache_data(self, position: int, data: AmietFrequencyData) -> None:
+        """Adds the data of a frequency to the cache, dropping the least
+        recently used ones until it fits in self.cache_bytes. A frequency that
+        is already cached (read at the same time by the prefetching thread and
+        the caller) is kept as is. Called with self._lock held.
+
+        Args:
+            position (int): Position of the frequency in self.frequencies.
+            data (AmietFrequencyData): Data of the frequency.
+
+        Returns:
+            None.
+        """
+        size = sum(
+            a.nbytes
+            for a in (data.steering_vector, data.csm, data.csm_factor)
+            if a is not None
+        )
+        if size > self.cache_bytes or position in self._cache:
+            return None
+        while self._cache_size + size > self.cache_bytes:
+            _, (_, dropped_size) = self._cache.popitem(last=False)
+            self._cache_size -= dropped_size
+        self._cache[position] = (data, size)
+        self._cache_size += size
+        return None
+
     def get_frequency_data(self, frequency: float) -> AmietFrequencyData:
         """Extracts the data for the frequency in the given index position.
 
         Args:
             frequency (float): Frequency to extract.
 
+        Raises:
+            ValueError: If the frequency isn't in the file (within the
+                tolerances of self.index), or its data isn't complete in the
+                file (interrupted run).
+
         Returns:
             AmietFrequencyData: Object instance with the data of the frequency.
         """
-        f_pos = index_of_value(self.frequencies, frequency)
-        hdf = File(self.file_name, "r")
+        f_pos = self.index.lookup(frequency)
+        if self.cache_bytes and not self.lazy:
+            with self._lock:
+                if f_pos in self._cache:
+                    self._cache.move_to_end(f_pos)
+                    self.cache_hits += 1
+                    return self._cache[f_pos][0]
+                self.cache_misses += 1
+        hdf = self.__file()
         fq = hdf.get("Frequency data")
-        freq_x = fq.get(f"freq_{f_pos}")
-        freq = float(freq_x.get("frequency")[()])
-        steering_vector = transpose(freq_x.get("steering_vector")[()])
-        # CSM for Acoular: (number of frequencies, numchannels, numchannels).
-        raw_csm = freq_x.get("CSM")[()]
-        csm = [zeros_like(raw_csm)]
-        csm.append(raw_csm)
-        csm = array(csm)
-        hdf.close()
+        if self._layout == 2:
+            if not fq.get("completed")[f_pos]:
+                raise ValueError(f"The data of {frequency} Hz isn't complete.")
+            # Stacked datasets, the frequency is the position in the first axis.
+            freq_x = fq
+            freq = float(self.frequencies[f_pos])
+        else:
+            freq_x = fq.get(f"freq_{f_pos}")
+            if freq_x is None:
+                raise ValueError(f"The data of {frequency} Hz isn't complete.")
+            freq = float(freq_x.get("frequency")[()])
+        if self.lazy:
+            return self.__lazy_frequency_data(freq_x, f_pos, freq)
+        if "steering_vector" in freq_x:
+            dataset = freq_x.get("steering_vector")
+            runs, N = self.__scan_columns()[:2]
+            steering_vector = _read_transposed(
+                dataset,
+                f_pos if self._layout == 2 else None,
+                empty((N, dataset.shape[-2]), dtype=dataset.dtype),
+                runs,
+            )
+        else:
+            # Compact file, only the frequency independent geometry is stored.
+            steering_vector = self.__rebuild_steering_vector(hdf, freq)
+        csm = self.__read_csm(freq_x, f_pos, steering_vector.shape[1])
+
+        data = AmietFrequencyData(freq, steering_vector, csm)
+        if self.cache_bytes:
+            with self._lock:
+                self.__cache_data(f_pos, data)
+        return data
+
+    def iter_frequency_data(
+        self, frequencies: list = None, prefetch: int = 1
+    ) -> Iterator[AmietFrequencyData]:
+        """Yields the data of the frequencies one at a time, while the next
+        ones are read by a background thread, so the HDF5 reads overlap the
+        work done by the caller on the current frequency (e.g. beamforming).
+        The time spent reading, waiting and the hidden reading time are added
+        to self.timings.
+
+        Args:
+            frequencies (list, optional): Frequencies to read. Defaults to
+                None, all the frequencies in the file.
+            prefetch (int, optional): Maximum number of frequencies read ahead
+                and kept in memory. Defaults to 1. With 0, the frequencies are
+                read only when requested.
+
+        Yields:
+            AmietFrequencyData: Data of each frequency, as given by
+                self.get_frequency_data().
+        """
+        if frequencies is None:
+            frequencies = self.frequencies
+        if prefetch < 1:
+            for frequency in frequencies:
+                yield self.get_frequency_data(frequency)
+            return None
+
+        queue, stop = Queue(maxsize=prefetch), Event()
+        thread = Thread(
+            target=self.__prefetch, args=(list(frequencies), queue, stop), daemon=True
+        )
+        thread.start()
+        read = wait = 0.0
+        try:
+            while True:
+                start = perf_counter()
+                item = queue.get()
+                wait += perf_counter() - start
+                if item is None:
+                    break
+                data, duration, error = item
+                if error is not None:
+                    raise error
+                read += duration
+                yield data
+        finally:
+            # Frees a blocked put, so the thread sees the stop request.
+            stop.set()
+            while thread.is_alive():
+                try:
+                    queue.get_nowait()
+                except Empty:
+                    pass
+                thread.join(0.01)
+            for name, value in (
+                ("prefetch_read", read),
+                ("prefetch_wait", wait),
+                ("prefetch_hidden", max(read - wait, 0.0)),
+            ):
+                self.timings[name] = self.timings.get(name, 0.0) + value
+        return None
+
+    def __prefetch(self, frequencies: list, queue: Queue, stop: Event) -> None:
+        """Reads the frequencies in order for self.iter_frequency_data(),
+        until all of them are read, an error happens or it's stopped.
+
+        Args:
+            frequencies (list): Frequencies to read.
+            queue (Queue): Queue of (data, reading time, error) items, ended by
+                None.
+            stop (Event): Set by the consumer to stop the reading.
+
+        Returns:
+            None.
+        """
+        for frequency in frequencies:
+            if stop.is_set():
+                return None
+            start = perf_counter()
+            try:
+                data, error = self.get_frequency_data(frequency), None
+            except Exception as exception:
+                data, error = None, exception
+            queue.put((data, perf_counter() - start, error))
+            if error is not None:
+                return None
+        queue.put(None)
+        return None
+
+    def __read_csm(self, freq_x: object, f_pos: int, M: int) -> ndarray:
+        """Reads the CSM of a frequency, in the format used by Acoular.
+
+        Args:
+            freq_x (h5py.Group): Group with the datasets of the frequency.
+            f_pos (int): Position of the frequency in the file.
+            M (int): Number of microphones.
+
+        Returns:
+            ndarray: CSM with shape (2, M, M), the first entry is zero.
+        """
+        sel = f_pos if self._layout == 2 else ()
+        # CSM for Acoular: (number of frequencies, numchannels, numchannels),
+        # written straight into the second entry of the output.
+        if "CSM_packed" in freq_x:
+            # Upper triangle of the Hermitian CSM, expanded in the output.
+            packed = freq_x.get("CSM_packed")[sel]
+            csm = zeros((2, M, M), dtype=packed.dtype)
+            unpack_hermitian(packed, out=csm[1])
+        elif "CSM" in freq_x:
+            dataset = freq_x.get("CSM")
+            csm = zeros((2, M, M), dtype=dataset.dtype)
+            dataset.read_direct(
+                csm, source_sel=s_[f_pos] if self._layout == 2 else None, dest_sel=s_[1]
+            )
+        else:
+            # Stored as a low-rank factor, CSM = F @ F^H.
+            factor = freq_x.get("CSM_factor")[sel]
+            csm = zeros((2, M, M), dtype=factor.dtype)
+            matmul(factor, factor.conj().T, out=csm[1])
+        return csm
+
+    def __lazy_frequency_data(
+        self, freq_x: object, f_pos: int, frequency: float
+    ) -> AmietFrequencyData:
+        """Gathers the data of a frequency as LazyArray proxies, which read
+        the file only when they're indexed.
+
+        Args:
+            freq_x (h5py.Group): Group with the datasets of the frequency.
+            f_pos (int): Position of the frequency in the file.
+            frequency (float): Frequency.
+
+        Returns:
+            AmietFrequencyData: Object instance with the data of the frequency.
+        """
+        M = self.__metadata("Microphone array")["mic_array"].shape[1]
+        N = self.__scan_columns()[1]
+        if "steering_vector" in freq_x:
+            sv_dtype = freq_x.get("steering_vector").dtype
+        else:
+            # Compact file, rebuilt in the precision of the generator.
+            sv_dtype = complex64
+        csm_name = next(
+            name for name in ("CSM", "CSM_packed", "CSM_factor") if name in freq_x
+        )
+        steering_vector = LazyArray(
+            (N, M), sv_dtype, partial(self._steering_rows, f_pos, frequency)
+        )
+        csm = LazyArray(
+            (2, M, M),
+            freq_x.get(csm_name).dtype,
+            partial(self._csm_rows, f_pos, M),
+        )
+        return AmietFrequencyData(frequency, steering_vector, csm)
+
+    def __frequency_group(self, f_pos: int) -> object:
+        """Group with the datasets of a frequency.
+
+        Args:
+            f_pos (int): Position of the frequency in the file.
+
+        Returns:
+            h5py.Group: 'Frequency data' in layout v2, or its freq_i group.
+        """
+        fq = self.__file().get("Frequency data")
+        return fq if self._layout == 2 else fq.get(f"freq_{f_pos}")
+
+    def _steering_rows(
+        self, f_pos: int, frequency: float, start: int, stop: int
+    ) -> ndarray:
+        """Reads the rows start:stop (scan points) of the steering vector of a
+        frequency, for its LazyArray proxy (not name-mangled, so the proxies
+        can be pickled with the reader).
+
+        Args:
+            f_pos (int): Position of the frequency in the file.
+            frequency (float): Frequency.
+            start (int): First row.
+            stop (int): End of the rows (not included).
+
+        Returns:
+            ndarray: Rows of the steering vector, shape (stop - start, M).
+        """
+        freq_x = self.__frequency_group(f_pos)
+        runs = _sub_runs(self.__scan_columns()[0], start, stop)
+        if "steering_vector" in freq_x:
+            dataset = freq_x.get("steering_vector")
+            return _read_transposed(
+                dataset,
+                f_pos if self._layout == 2 else None,
+                empty((stop - start, dataset.shape[-2]), dtype=dataset.dtype),
+                runs,
+            )
+        if not runs:
+            M = self.__metadata("Microphone array")["mic_array"].shape[1]
+            return empty((0, M), dtype=complex64)
+        return self.__rebuild_steering_vector(self.__file(), frequency, runs)
+
+    def _csm_rows(self, f_pos: int, M: int, start: int, stop: int) -> ndarray:
+        """Reads the entries start:stop of the (2, M, M) CSM of a frequency,
+        for its LazyArray proxy.
+
+        Args:
+            f_pos (int): Position of the frequency in the file.
+            M (int): Number of microphones.
+            start (int): First entry.
+            stop (int): End of the entries (not included).
+
+        Returns:
+            ndarray: Entries of the CSM, shape (stop - start, M, M).
+        """
+        return self.__read_csm(self.__frequency_group(f_pos), f_pos, M)[start:stop]
+
+    def get_frequency_block(
+        self, frequencies: list = None, out: Tuple[ndarray, ndarray] = None
+    ) -> Tuple[ndarray, ndarray]:
+        """Extracts the CSMs and steering vectors of several frequencies in
+        one pass, as contiguous arrays. Given buffers are filled in place, so
+        repeated sweeps over the spectrum don't allocate new arrays.
+
+        Args:
+            frequencies (list, optional): Frequencies to extract. Defaults to
+                None, all the frequencies in the file.
+            out (Tuple[ndarray, ndarray], optional): C-contiguous complex64
+                buffers with shapes (F, M, M) and (F, N, M), where the CSMs and
+                steering vectors are written. Defaults to None (new arrays).
+
+        Raises:
+            ValueError: If the buffers don't have the needed shapes, or the
+                data of a frequency isn't complete in the file.
+
+        Returns:
+            Tuple[ndarray, ndarray]: CSMs with shape (F, M, M) and steering
+                vectors with shape (F, N, M).
+        """
+        if frequencies is None:
+            frequencies = self.frequencies
+        positions = [self.index.lookup(f) for f in frequencies]
+        fq = self.__file().get("Frequency data")
+        stacked = self._layout == 2 and "CSM" in fq and "steering_vector" in fq
+        if stacked:
+            if not all(fq.get("completed")[sorted(set(positions))]):
+                raise ValueError("The data of some frequencies isn't complete.")
+            M = fq.get("steering_vector").shape[1]
+            runs, N = self.__scan_columns()[:2]
+        else:
+            first = self.get_frequency_data(frequencies[0])
+            N, M = first.steering_vector.shape
+
+        F = len(positions)
+        if out is None:
+            out = (
+                empty((F, M, M), dtype=complex64),
+                empty((F, N, M), dtype=complex64),
+            )
+        csm, steering_vector = out
+        for buffer, shape in ((csm, (F, M, M)), (steering_vector, (F, N, M))):
+            if (
+                buffer.shape != shape
+                or buffer.dtype != complex64
+                or not buffer.flags.c_contiguous
+            ):
+                raise ValueError(f"The buffers must be C-contiguous {shape} complex64.")
+
+        if not stacked:
+            for k, frequency in enumerate(frequencies):
+                data = first if k == 0 else self.get_frequency_data(frequency)
+                csm[k] = data.csm[1]
+                steering_vector[k] = data.steering_vector
+            return (csm, steering_vector)
+
+        if positions == list(range(positions[0], positions[0] + F)):
+            # Consecutive frequencies, a single hyperslab read.
+            fq.get("CSM").read_direct(
+                csm, source_sel=s_[positions[0] : positions[0] + F]
+            )
+        else:
+            for k, position in enumerate(positions):
+                fq.get("CSM").read_direct(csm, source_sel=s_[position], dest_sel=s_[k])
+        # Saved as (M, N), transposed block by block into the output.
+        for k, position in enumerate(positions):
+            _read_transposed(
+                fq.get("steering_vector"), position, steering_vector[k], runs
+            )
+        return (csm, steering_vector)
+
+    def get_csm_slice(
+        self, mics: slice = slice(None), frequencies: list = None
+    ) -> ndarray:
+        """Extracts the CSMs of several frequencies for a block of
+        microphones, e.g. slice(0, 8) for the mics 0 to 7. In layout v2 files
+        with full CSMs, it's a single hyperslab read.
+
+        Args:
+            mics (slice, optional): Microphones of the block. Defaults to
+                slice(None), all of them.
+            frequencies (list, optional): Frequencies to extract. Defaults to
+                None, all the frequencies in the file.
+
+        Returns:
+            ndarray: CSMs with shape (number of frequencies, m, m).
+        """
+        if frequencies is None:
+            frequencies = self.frequencies
+        positions = [self.index.lookup(f) for f in frequencies]
+        hdf = self.__file()
+        fq = hdf.get("Frequency data")
+        if self._layout == 2 and "CSM" in fq:
+            # h5py needs increasing positions, the block is reordered after.
+            increasing = sorted(set(positions))
+            if not all(fq.get("completed")[increasing]):
+                raise ValueError("The data of some frequencies isn't complete.")
+            block = fq.get("CSM")[increasing, mics, mics]
+            return block[[increasing.index(p) for p in positions]]
+        return array(
+            [self.get_frequency_data(f).csm[1][mics, mics] for f in frequencies]
+        )
+
+    def __rebuild_steering_vector(
+        self, hdf: File, frequency: float, runs: List[Tuple[int, int]] = None
+    ) -> ndarray:
+        """Calculates the steering vector of a frequency from the shearlayer
+        matrices of the scan points, saved once in compact files. The
+        geometry of the scan points inside self.roi is read only on the first
+        call.
+
+        Args:
+            hdf (h5py.File): Opened HDF5 file.
+            frequency (float): Frequency of the steering vector.
+            runs (List[Tuple[int, int]], optional): Runs of scan points of a
+                block of a lazy steering vector. Only their geometry is read,
+                and it isn't kept. Defaults to None (scan points inside
+                self.roi).
+
+        Returns:
+            ndarray: Steering vector, with shape (N, M).
+        """
+        start = perf_counter()
+        if runs is not None:
+            geometry = self.__steering_geometry(hdf, runs)
+        else:
+            if self._steering_geometry is None:
+                self._steering_geometry = self.__steering_geometry(
+                    hdf, self.__scan_columns()[0]
+                )
+            geometry = self._steering_geometry
+        scan_xyz, XYZ_array, XYZ_sl, T_sl, c0, Mach = geometry
+        G_grid = dipole_shear(
+            scan_xyz, XYZ_array, XYZ_sl, T_sl, 2 * pi * frequency / c0, c0, Mach
+        )
+        W = beamforming_filters(G_grid, out=G_grid)
+        steering_vector = ascontiguousarray(W.T, dtype=complex64)
+        self.timings["steering_vector"] = (
+            self.timings.get("steering_vector", 0.0) + perf_counter() - start
+        )
+        return steering_vector
+
+    def __steering_geometry(self, hdf: File, runs: List[Tuple[int, int]]) -> tuple:
+        """Reads the geometry needed to calculate the steering vectors of some
+        scan points of a compact file.
 
-        return AmietFrequencyData(freq, steering_vector, csm)
+        Args:
+            hdf (h5py.File): Opened HDF5 file.
+            runs (List[Tuple[int, int]]): Start and stop of each run of scan
+                points.
+
+        Returns:
+            tuple: Scan points, microphones, shearlayer matrices of the scan
+                points, speed of sound and Mach number.
+        """
+        gi = self.__metadata("Grid info")
+        scan_xy = rect_grid(gi["scan_length"], gi["scan_spacing"])
+        scan_xy = concatenate([scan_xy[:, a:b] for a, b in runs], axis=1)
+        ts = self.__metadata("TestSetup")
+        sl = hdf.get("Shear layer")
+        return (
+            concatenate((scan_xy, zeros((1, scan_xy.shape[1])))),
+            self.__metadata("Microphone array")["mic_array"],
+            concatenate([sl.get("XYZ_sl")[..., a:b] for a, b in runs], axis=-1),
+            concatenate([sl.get("T_sl")[..., a:b] for a, b in runs], axis=-1),
+            ts["c0"],
+            ts["Ux"] / ts["c0"],
+        )
 
     def get_mic_array(self) -> Tuple[str, ndarray, int]:
         """Extract the related informations of the microphe array used in the
@@ -129,31 +947,76 @@ class AmietDataReader:
             Tuple[str, np.ndarray, int]: name of the xml file, microphone array
                 matrix and number of microphones.
         """
-        hdf = File(self.file_name, "r")
-        ma = hdf.get("Microphone array")  # ma -> Microphone array
-        file_name = ma.get(f"file_name")[()]
-        mic_array = ma.get(f"mic_array")[()]
-        mics_number = ma.get(f"mics_number")[()]
-        hdf.close()
-        return (file_name, mic_array, mics_number)
+        ma = self.__metadata("Microphone array")  # ma -> Microphone array
+        return (ma["file_name"], ma["mic_array"], ma["mics_number"])
+
+    def __scan_columns(self) -> Tuple[List[Tuple[int, int]], int, tuple]:
+        """Finds the scan points (columns of the steering vectors) inside
+        self.roi. The points of rect_grid are ordered row by row, with x
+        varying fastest, so each row of the grid inside the region is one run
+        of consecutive columns, read as a single hyperslab.
+
+        Raises:
+            ValueError: If there are no scan points inside self.roi.
+
+        Returns:
+            Tuple[List[Tuple[int, int]], int, tuple]: Start and stop of each
+                run of columns, number of scan points inside the region and
+                its limits (x_min, x_max, y_min, y_max) on the grid.
+        """
+        if "columns" not in self._objects:
+            gi = self.__metadata("Grid info")
+            scan_xy = rect_grid(gi["scan_length"], gi["scan_spacing"])
+            x, y = unique(scan_xy[0]), unique(scan_xy[1])
+            if self.roi is None:
+                ix, iy = arange(len(x)), arange(len(y))
+            else:
+                # Points on the edges are kept, despite rounding errors.
+                tol = 1e-9 * max(abs(x).max(), abs(y).max(), 1.0)
+                x_min, x_max, y_min, y_max = self.roi
+                ix = flatnonzero((x >= x_min - tol) & (x <= x_max + tol))
+                iy = flatnonzero((y >= y_min - tol) & (y <= y_max + tol))
+                if not len(ix) or not len(iy):
+                    raise ValueError(
+                        f"There are no scan points inside the region {self.roi}."
+                    )
+            Nx, first, last = len(x), int(ix[0]), int(ix[-1]) + 1
+            if len(ix) == Nx:
+                # Full rows, a single run of columns.
+                runs = [(int(iy[0]) * Nx, (int(iy[-1]) + 1) * Nx)]
+            else:
+                runs = [(int(j) * Nx + first, int(j) * Nx + last) for j in iy]
+            self._objects["columns"] = (
+                runs,
+                len(ix) * len(iy),
+                (x[ix[0]], x[ix[-1]], y[iy[0]], y[iy[-1]]),
+            )
+        return self._objects["columns"]
 
     def get_grid(self) -> RectGrid:
         """Extract the related information of the grid used in the data
-            generation and returns an acoular.RectGrid instance.
+            generation and returns an acoular.RectGrid instance. With a
+            region of interest, the grid is cropped to the scan points inside
+            it, in the same order as the steering vectors.
 
         Returns:
             RectGrid: RectGrid object.
         """
-        hdf = File(self.file_name, "r")
-        gi = hdf.get("Grid info")  # gi -> Grid info
-        return RectGrid(
-            x_min=gi.get("x_min")[()],
-            x_max=gi.get("x_max")[()],
-            y_min=gi.get("y_min")[()],
-            y_max=gi.get("y_max")[()],
-            z=gi.get("z")[()],
-            increment=gi.get("increment")[()],
-        )
+        if "grid" not in self._objects:
+            gi = self.__metadata("Grid info")  # gi -> Grid info
+            if self.roi is None:
+                limits = (gi["x_min"], gi["x_max"], gi["y_min"], gi["y_max"])
+            else:
+                limits = self.__scan_columns()[2]
+            self._objects["grid"] = RectGrid(
+                x_min=limits[0],
+                x_max=limits[1],
+                y_min=limits[2],
+                y_max=limits[3],
+                z=gi["z"],
+                increment=gi["increment"],
+            )
+        return self._objects["grid"]
 
     def get_airfoil(self) -> AirfoilGeom:
         """Extract the airfoil geometry used in the data generation and returns
@@ -162,14 +1025,10 @@ class AmietDataReader:
         Returns:
             AirfoilGeom : AirfoilGeom object.
         """
-        hdf = File(self.file_name, "r")
-        ag = hdf.get("AirfoilGeom")  # ag -> AirfoilGeom
-        b = ag.get(f"b")[()]
-        d = ag.get(f"d")[()]
-        Nx = ag.get(f"Nx")[()]
-        Ny = ag.get(f"Ny")[()]
-        hdf.close()
-        return AirfoilGeom(b, d, Nx, Ny)
+        if "airfoil" not in self._objects:
+            ag = self.__metadata("AirfoilGeom")  # ag -> AirfoilGeom
+            self._objects["airfoil"] = AirfoilGeom(ag["b"], ag["d"], ag["Nx"], ag["Ny"])
+        return self._objects["airfoil"]
 
     def get_setup(self) -> TestSetup:
         """Extract the test setup used in the main data generation and returns
@@ -178,17 +1037,18 @@ class AmietDataReader:
         Returns:
             TestSetup: TestSetup object.
         """
-        hdf = File(self.file_name, "r")
-        ts = hdf.get("TestSetup")  # ts -> TestSetup
-        c0 = ts.get(f"c0")[()]
-        rho0 = ts.get(f"rho0")[()]
-        p_ref = ts.get(f"p_ref")[()]
-        Ux = ts.get(f"Ux")[()]
-        turb_intensity = ts.get(f"turb_intensity")[()]
-        length_scale = ts.get(f"length_scale")[()]
-        z_sl = ts.get(f"z_sl")[()]
-        hdf.close()
-        return TestSetup(c0, rho0, p_ref, Ux, turb_intensity, length_scale, z_sl)
+        if "setup" not in self._objects:
+            ts = self.__metadata("TestSetup")  # ts -> TestSetup
+            self._objects["setup"] = TestSetup(
+                ts["c0"],
+                ts["rho0"],
+                ts["p_ref"],
+                ts["Ux"],
+                ts["turb_intensity"],
+                ts["length_scale"],
+                ts["z_sl"],
+            )
+        return self._objects["setup"]
 
     def get_run_data(self) -> Tuple[str, str, str]:
         """Extract the running data information used in the data generation.
@@ -197,13 +1057,8 @@ class AmietDataReader:
             Tuple[str, str, str]: date of run, start time and end time of the
                 data generation.
         """
-        hdf = File(self.file_name, "r")
-        rd = hdf.get("Run data")  # rd -> Run data
-        date = rd.get(f"date")[()]
-        start_time = rd.get(f"start_time")[()]
-        end_time = rd.get(f"end_time")[()]
-        hdf.close()
-        return (date, start_time, end_time)
+        rd = self.__metadata("Run data")  # rd -> Run data
+        return (rd.get("date"), rd.get("start_time"), rd.get("end_time"))
 
     def __str__(self) -> str:
         # Get only the date value, and ignore the others.
@@ -215,95 +1070,411 @@ class AmietDataReader:
 
 
 @dataclass
-class AmietDataGenerator:
-    """Object with the focus to generate the data for the Airfoil, using the
-        amiet_tools toolbox by Fabio Casagrande Hirono.
+class AmietDataWriter:
+    """Class used to keep an HDF5 file open for the whole data generation.
+    The writes are done by a background thread, so saving a frequency
+    overlaps the calculation of the next ones.
 
     Args:
-        test_setup (object): TestSetup object instance.
-        airfoil_geom (object): AirfoilGeom object instance.
-        mic_array (object): Acoular's MicArray instane.
-        frequencies (list): List containing all the frequencies values to be
-            used. If it isn't a list it would also work, but needs to be an int
-            or a float.
-        distance (float): If the array position in z axis if different from
-            the one in the MicArray object instance.
-        scan_length (list): Maximum size of the scan grid.
-        scan_spacing (list): Spacing between the scanning points.
-        data_name (str): Data file name, used for saving the data file.
-            Defaults to 'Unknown'.
-        steps (bool): If True, prints the code steps with timestamp.
-            Defaults to False.
+        file_name (str): Name of the HDF5 file (with the directory location).
+        mode (str): h5py file mode, 'w' to create a new file or 'a' to
+            change an existing one. Defaults to 'a'.
+        queue_size (int): Maximum number of writes waiting for the background
+            thread. Defaults to 1.
+
+    Attributes:
+        file (h5py.File): Opened HDF5 file.
+
     Returns:
-        GenerateData instance.
+        AmietDataWriter instance.
     """
 
-    test_setup: object
-    airfoil_geom: object
-    mic_array: object
-    frequencies: list
-    distance: float
-    scan_length: list
-    scan_spacing: list
-    data_name: str = "Unknown"
-    steps: bool = False
+    file_name: str
+    mode: str = "a"
+    queue_size: int = 1
 
     def __post_init__(self) -> None:
-        """Post initializes the object to configure the future steps to generate
-        the airfoil simulated data.
+        """Opens the HDF5 file and starts the background writer thread.
 
         Returns:
             None.
         """
-        # Starts an empty data file
-        hdf = File(f"{self.data_name}.h5", "w")
-        hdf.close()
-
-        self._init_test_setup()
-        self._init_grid_info()
-        if self.airfoil_geom:
-            self._init_airfoil_geom()
-            self._XYZ_airfoil_calc = self._XYZ_airfoil.reshape(3, self._Nx * self._Ny)
-        if self.mic_array:
-            self._XYZ_array = self._init_mic_array()
-
+        self.file = File(self.file_name, self.mode)
+        self._error = None
+        self._queue = Queue(maxsize=self.queue_size)
+        self._thread = Thread(target=self.__work, daemon=True)
+        self._thread.start()
         return None
 
-    def _init_mic_array(self) -> ndarray:
-        """Initiliazes the microphone array as a numpy array, it uses the
-        object from the Acoular toolbox, MicArray. It also checks if a different
-        distance it given and applies it. In the end saves the microphone array
-        positions to the HDF5 file.
+    def __work(self) -> None:
+        """Runs the submitted writes in order, until the thread is stopped by
+        self.close(). After an error, the remaining writes are skipped.
 
         Returns:
             None.
         """
-        self._M = self.mic_array.num_mics
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return None
+                if self._error is None:
+                    step, args = task
+                    step(*args)
+            except BaseException as error:
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def __raise_error(self) -> None:
+        """Raises, in the calling thread, the error of a failed write.
 
-        if self.distance:
-            z = self.distance * ones(self._M)
-            arr = array([self.mic_array.mpos[0], self.mic_array.mpos[1], z])
-        else:
-            arr = array(
-                [self.mic_array.mpos[0], self.mic_array.mpos[1], self.mic_array.mpos[2]]
-            )
-            self.distance = self.mic_array.mpos[2][0]
-
-        hdf = File(f"{self.data_name}.h5", "a")
-        ma = hdf.create_group("Microphone array")
-        ma.create_dataset("file_name", data=self.mic_array.basename)
-        ma.create_dataset("mics_number", data=self._M, dtype=int64)
-        ma.create_dataset("mic_array", data=arr, dtype=float64)
-        hdf.close()
+        Returns:
+            None.
+        """
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        return None
 
-        self.__timeit("Microphone array has been successfully initialized!")
+    def write_metadata(self, metadata: Dict[str, Dict[str, tuple]]) -> None:
+        """Writes the metadata groups. Scalars and strings are saved as
+        attributes of the group, and arrays as datasets.
 
-        return arr
+        Args:
+            metadata (Dict[str, Dict[str, tuple]]): {group: {name: (value,
+                dtype)}}, a None dtype keeps the value as it is.
+
+        Returns:
+            None.
+        """
+        for group_name, datasets in metadata.items():
+            group = self.file.require_group(group_name)
+            for name, (value, dtype) in datasets.items():
+                if dtype is not None:
+                    value = array(value, dtype=dtype)
+                if dtype is None or value.ndim == 0:
+                    group.attrs[name] = value
+                else:
+                    group.create_dataset(name, data=value)
+        return None
+
+    def submit(self, step: Callable, *args) -> None:
+        """Queues a write to be done by the background thread. Blocks while
+        the queue is full.
+
+        Args:
+            step (Callable): Function that writes to self.file.
+            *args: Arguments passed to the function.
+
+        Raises:
+            Exception: The error of a previous write that failed.
+
+        Returns:
+            None.
+        """
+        self.__raise_error()
+        self._queue.put((step, args))
+        return None
+
+    def flush(self) -> None:
+        """Waits for the queued writes and flushes the file.
+
+        Raises:
+            Exception: The error of a write that failed.
+
+        Returns:
+            None.
+        """
+        self._queue.join()
+        self.__raise_error()
+        self.file.flush()
+        return None
+
+    def close(self) -> None:
+        """Waits for the queued writes, stops the background thread and
+        closes the file. Errors of the writes are raised by self.flush().
+
+        Returns:
+            None.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self.file:
+            self.file.close()
+        return None
+
+    def __enter__(self) -> object:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+        return None
+
+
+@dataclass
+class AmietDataGenerator:
+    """Object with the focus to generate the data for the Airfoil, using the
+        amiet_tools toolbox by Fabio Casagrande Hirono.
+
+    Args:
+        test_setup (object): TestSetup object instance.
+        airfoil_geom (object): AirfoilGeom object instance.
+        mic_array (object): Acoular's MicArray instane.
+        frequencies (list): List containing all the frequencies values to be
+            used. If it isn't a list it would also work, but needs to be an int
+            or a float.
+        distance (float): If the array position in z axis if different from
+            the one in the MicArray object instance.
+        scan_length (list): Maximum size of the scan grid.
+        scan_spacing (list): Spacing between the scanning points.
+        data_name (str): Data file name, used for saving the data file.
+            Defaults to 'Unknown'.
+        steps (bool): If True, prints the code steps with timestamp.
+            Defaults to False.
+        mode (str): 'w' creates a new data file, overwriting any existing one.
+            'resume' continues an interrupted run: the configuration stored in
+            the existing file must be the same as the current one, and only
+            the frequencies without a complete group are calculated. 'append'
+            works like 'resume', but the frequencies that aren't in the file
+            yet are added to it. Defaults to 'w'.
+        store_shear_layer (bool): If True, the frequency independent shearlayer
+            matrices are saved to the HDF5 file, so runs in 'resume' or
+            'append' mode don't need to calculate them again. Defaults to
+            False.
+        batch_size (int): Number of frequencies whose transfer matrices are
+            built together, as (batch_size, M, N) tensors, instead of one
+            dipole_shear call per frequency. Larger blocks are faster but use
+            batch_size times more memory for the transfer matrices. Results
+            agree with the per-frequency path up to rounding errors. Defaults
+            to 1 (one frequency at a time).
+        csm_rank (int): If given, the CSMs are calculated in factorized mode,
+            CSM = (G @ L) @ (G @ L)^H, with L a low-rank factor of the source
+            CSM with csm_rank columns. Defaults to None.
+        csm_energy (float): If given (and no csm_rank), the CSMs are calculated
+            in factorized mode, with the smallest low-rank factor that keeps
+            this fraction of the source CSM energy (e.g. 0.999). The kept
+            fraction is saved as 'CSM_energy'. Defaults to None.
+        csm_format (str): 'full' saves the M x M CSM. 'packed' saves only its
+            upper triangle, M * (M + 1) / 2 values, since the CSM is
+            Hermitian. 'factor' saves the M x r low-rank factor F of the CSM
+            (CSM = F @ F^H) instead, and needs csm_rank or csm_energy.
+            Defaults to 'full'.
+        compression (str): HDF5 compression filter of the frequency datasets,
+            'gzip' or 'lzf'. Defaults to None (no compression).
+        compression_opts (int): Compression level of 'gzip', from 0 to 9.
+            Defaults to None (h5py default, 4).
+        shuffle (bool): If True, the byte-shuffle filter is applied before the
+            compression, which usually improves it for floats. Defaults to
+            False.
+        fletcher32 (bool): If True, a checksum of each chunk is saved and
+            checked on every read. Defaults to False.
+        compact (bool): If True, the steering vectors aren't saved. The
+            shearlayer matrices of the scan points are saved once instead, and
+            AmietDataReader rebuilds the steering vector of each frequency
+            when it's read, which makes files with many frequencies much
+            smaller at a small CPU cost when reading. Defaults to False.
+        layout (int): Layout of the frequency data in new files. 2 stacks the
+            frequencies in single datasets (CSM[F, M, M], steering_vector[F,
+            M, N]), so reads across frequencies are single hyperslab reads. 1
+            saves one freq_i group per frequency, as older versions. Existing
+            files keep their layout in 'resume' and 'append' modes. Defaults
+            to 2.
+        chunk_points (int): Number of scan points per chunk of the steering
+            vectors, which are saved in column blocks of (M, chunk_points),
+            so reading a part of the grid only reads its blocks. Defaults to
+            None (1024 points in layout v2 files or when any filter is used,
+            otherwise not chunked).
+
+    Attributes:
+        timings (dict): Accumulated time (in seconds) spent on each stage of
+            the simulation, filled while running.
+
+    Returns:
+        GenerateData instance.
+    """
+
+    test_setup: object
+    airfoil_geom: object
+    mic_array: object
+    frequencies: list
+    distance: float
+    scan_length: list
+    scan_spacing: list
+    data_name: str = "Unknown"
+    steps: bool = False
+    mode: str = "w"
+    store_shear_layer: bool = False
+    batch_size: int = 1
+    csm_rank: int = None
+    csm_energy: float = None
+    csm_format: str = "full"
+    compression: str = None
+    compression_opts: int = None
+    shuffle: bool = False
+    fletcher32: bool = False
+    compact: bool = False
+    layout: int = 2
+    chunk_points: int = None
+
+    def __post_init__(self) -> None:
+        """Post initializes the object to configure the future steps to generate
+        the airfoil simulated data.
+
+        Returns:
+            None.
+        """
+        if self.mode not in ("w", "resume", "append"):
+            raise ValueError(
+                f"Unknown mode '{self.mode}', use 'w', 'resume' or 'append'."
+            )
+        if self.csm_format not in ("full", "packed", "factor"):
+            raise ValueError(
+                f"Unknown csm_format '{self.csm_format}', "
+                "use 'full', 'packed' or 'factor'."
+            )
+        if self.csm_format == "factor" and not (self.csm_rank or self.csm_energy):
+            raise ValueError("csm_format 'factor' needs csm_rank or csm_energy.")
+        if self.layout not in (1, 2):
+            raise ValueError(f"Unknown layout {self.layout}, use 1 or 2.")
+        if self.compression not in (None, "gzip", "lzf"):
+            raise ValueError(
+                f"Unknown compression '{self.compression}', use 'gzip' or 'lzf'."
+            )
+        self.timings = {}
+        self._precomputed = False
+        # Metadata groups of the HDF5 file: {group: {dataset: (value, dtype)}}
+        self._metadata = {}
+
+        self._init_test_setup()
+        if self.airfoil_geom:
+            self._init_airfoil_geom()
+            self._XYZ_airfoil_calc = self._XYZ_airfoil.reshape(3, self._Nx * self._Ny)
+        if self.mic_array:
+            self._XYZ_array = self._init_mic_array()
+        # After the microphone array, since it may define the distance.
+        self._init_grid_info()
+
+        return None
+
+    def _init_data_file(self) -> AmietDataWriter:
+        """Opens the HDF5 file for the whole run, starting it with the
+        metadata groups before the first frequency is saved by self.run().
+        When resuming, the metadata already stored is checked against the
+        current configuration instead (in 'resume' and 'append' modes).
+
+        Raises:
+            ValueError: If resuming a file created with a different
+                configuration.
+
+        Returns:
+            AmietDataWriter: Writer of the opened file.
+        """
+        file_name = f"{self.data_name}.h5"
+        if self.mode != "w" and isfile(file_name):
+            writer = AmietDataWriter(file_name, "a")
+            try:
+                self._check_metadata(writer.file)
+            except ValueError:
+                writer.close()
+                raise
+            self.__timeit("Stored configuration matches, resuming the data file!")
+            return writer
+
+        writer = AmietDataWriter(file_name, "w")
+        writer.write_metadata(self._metadata)
+        return writer
+
+    def _check_metadata(self, hdf: File) -> None:
+        """Compares the metadata groups stored in the HDF5 file with the ones
+        of the current configuration.
+
+        Args:
+            hdf (h5py.File): Opened HDF5 file.
+
+        Raises:
+            ValueError: If any of the stored values is missing or different.
+
+        Returns:
+            None.
+        """
+        for group_name, datasets in self._metadata.items():
+            for name, (value, dtype) in datasets.items():
+                group = hdf.get(group_name)
+                stored = None if group is None else _read_value(group, name)
+                if stored is None:
+                    raise ValueError(f"'{group_name}/{name}' is missing in the file.")
+                if isinstance(stored, bytes):
+                    stored = stored.decode()
+                if dtype is None:
+                    equal = stored == value
+                else:
+                    equal = array_equal(stored, array(value, dtype=dtype))
+                if not equal:
+                    raise ValueError(
+                        f"'{group_name}/{name}' in the file ({stored}) differs "
+                        f"from the current configuration ({value})."
+                    )
+        return None
+
+    def _check_storage(self, fd: object) -> None:
+        """Compares the storage options of the frequency data in the HDF5
+        file with the current ones, since resuming with different ones would
+        mix incompatible datasets. The layout isn't compared, the file keeps
+        its own.
+
+        Args:
+            fd (h5py.Group): 'Frequency data' group of the HDF5 file.
+
+        Raises:
+            ValueError: If any of the stored options is different.
+
+        Returns:
+            None.
+        """
+        for name, stored in _storage_attributes(fd).items():
+            if stored != getattr(self, name):
+                raise ValueError(
+                    f"'{name}' of the file ({stored!r}) differs from the current "
+                    f"configuration ({getattr(self, name)!r})."
+                )
+        return None
+
+    def _init_mic_array(self) -> ndarray:
+        """Initiliazes the microphone array as a numpy array, it uses the
+        object from the Acoular toolbox, MicArray. It also checks if a different
+        distance it given and applies it. In the end adds the microphone array
+        positions to the metadata of the HDF5 file.
+
+        Returns:
+            ndarray: Microphone positions, with shape (3, M).
+        """
+        self._M = self.mic_array.num_mics
+
+        if self.distance:
+            z = self.distance * ones(self._M)
+            arr = array([self.mic_array.mpos[0], self.mic_array.mpos[1], z])
+        else:
+            arr = array(
+                [self.mic_array.mpos[0], self.mic_array.mpos[1], self.mic_array.mpos[2]]
+            )
+            self.distance = self.mic_array.mpos[2][0]
+
+        self._metadata["Microphone array"] = {
+            "file_name": (self.mic_array.basename, None),
+            "mics_number": (self._M, int64),
+            "mic_array": (arr, float64),
+        }
+
+        self.__timeit("Microphone array has been successfully initialized!")
+
+        return arr
 
     def _init_test_setup(self) -> None:
         """Extract the data from the TestSetup object, using an already existing
-        instance, passed to the class when setting up the object. Also saves the
-        necessary data to the HDF5 file.
+        instance, passed to the class when setting up the object. Also adds the
+        necessary data to the metadata of the HDF5 file.
 
         Returns:
             None.
@@ -322,23 +1493,22 @@ class AmietDataGenerator:
             self._dipole_axis,
         ) = self.test_setup.export_values()
 
-        hdf = File(f"{self.data_name}.h5", "a")
-        ts = hdf.create_group("TestSetup")
-        ts.create_dataset("c0", data=self._c0, dtype=float64)
-        ts.create_dataset("rho0", data=self._rho0, dtype=float64)
-        ts.create_dataset("p_ref", data=self._p_ref, dtype=float64)
-        ts.create_dataset("Ux", data=self._Ux, dtype=float64)
-        ts.create_dataset("turb_intensity", data=self._turb_intensity, dtype=float64)
-        ts.create_dataset("length_scale", data=self._length_scale, dtype=float64)
-        ts.create_dataset("z_sl", data=self._z_sl, dtype=float64)
-        hdf.close()
+        self._metadata["TestSetup"] = {
+            "c0": (self._c0, float64),
+            "rho0": (self._rho0, float64),
+            "p_ref": (self._p_ref, float64),
+            "Ux": (self._Ux, float64),
+            "turb_intensity": (self._turb_intensity, float64),
+            "length_scale": (self._length_scale, float64),
+            "z_sl": (self._z_sl, float64),
+        }
 
         self.__timeit("TestSetup variables have been successfully initialized!")
         return None
 
     def _init_airfoil_geom(self) -> None:
-        """Initializes ArifoilGeom object and saves the necessary data to the
-        HDF5 file.
+        """Initializes ArifoilGeom object and adds the necessary data to the
+        metadata of the HDF5 file.
 
         Returns:
             None.
@@ -353,43 +1523,39 @@ class AmietDataGenerator:
             self._dy,
         ) = self.airfoil_geom.export_values()
 
-        hdf = File(f"{self.data_name}.h5", "a")
-        ag = hdf.create_group("AirfoilGeom")
-        ag.create_dataset("b", data=self._b, dtype=float64)
-        ag.create_dataset("d", data=self._d, dtype=float64)
-        ag.create_dataset("Nx", data=self._Nx, dtype=int64)
-        ag.create_dataset("Ny", data=self._Ny, dtype=int64)
-        hdf.close()
+        self._metadata["AirfoilGeom"] = {
+            "b": (self._b, float64),
+            "d": (self._d, float64),
+            "Nx": (self._Nx, int64),
+            "Ny": (self._Ny, int64),
+        }
 
         self.__timeit("AirfoilGeom variables have been successfully initialized!")
         return None
 
     def _init_grid_info(self) -> None:
-        """Saves the grid data to the HDF5 file.
+        """Adds the grid data to the metadata of the HDF5 file.
 
         Returns:
             None.
         """
-
-        hdf = File(f"{self.data_name}.h5", "a")
-        gi = hdf.create_group("Grid info")
-        gi.create_dataset("scan_length", data=self.scan_length, dtype=float64)
-        gi.create_dataset("scan_spacing", data=self.scan_spacing, dtype=float64)
-        gi.create_dataset("x_min", data=-self.scan_length[0] / 2, dtype=float64)
-        gi.create_dataset("x_max", data=self.scan_length[0] / 2, dtype=float64)
-        gi.create_dataset("y_min", data=-self.scan_length[1] / 2, dtype=float64)
-        gi.create_dataset("y_max", data=self.scan_length[1] / 2, dtype=float64)
-        gi.create_dataset(
-            "increment",
-            data=(
-                self.scan_spacing[0]
-                if self.scan_spacing[0] == self.scan_spacing[1]
-                else 0
+        self._metadata["Grid info"] = {
+            "scan_length": (self.scan_length, float64),
+            "scan_spacing": (self.scan_spacing, float64),
+            "x_min": (-self.scan_length[0] / 2, float64),
+            "x_max": (self.scan_length[0] / 2, float64),
+            "y_min": (-self.scan_length[1] / 2, float64),
+            "y_max": (self.scan_length[1] / 2, float64),
+            "increment": (
+                (
+                    self.scan_spacing[0]
+                    if self.scan_spacing[0] == self.scan_spacing[1]
+                    else 0
+                ),
+                float64,
             ),
-            dtype=float64,
-        )
-        gi.create_dataset("z", data=self.distance, dtype=float64)
-        hdf.close()
+            "z": (self.distance, float64),
+        }
         self.__timeit("Grid info has been successfully initialized!")
         return None
 
@@ -406,10 +1572,27 @@ class AmietDataGenerator:
         """
         self._frequency = float(frequency)
         self._FreqVars = FrequencyVars(self._frequency, self.test_setup)
-        (self._k0, self._Kx, self._Ky_crit) = self._FreqVars.export_values()
+        self._k0, self._Kx, self._Ky_crit = self._FreqVars.export_values()
         self.__timeit("FrequencyVars variables have been successfully initialized!")
         return None
 
+    def _run_stage(self, stage: str, step: Callable, *args) -> None:
+        """Runs one step of the simulation and adds its duration to the
+        stage timings.
+
+        Args:
+            stage (str): Name of the stage in self.timings.
+            step (Callable): Method that executes the step.
+            *args: Arguments passed to the step.
+
+        Returns:
+            None.
+        """
+        start = perf_counter()
+        step(*args)
+        self.timings[stage] = self.timings.get(stage, 0.0) + perf_counter() - start
+        return None
+
     def _fwd_problem(self) -> None:
         """Calculates the general ShearLayer Matrix from amiet_tools. This
         matrix is the same for all frequencies and only depends on the airfoil
@@ -455,6 +1638,18 @@ class AmietDataGenerator:
         """Calculates the CSM with the use of the ShearLayer Matrix from the
         foward problem step.
 
+        Returns:
+            None.
+        """
+        self._fwd_transfer()
+        self._csm_from_transfer(self._G_fwd)
+        self.__timeit("CSM has been successfully calculated!")
+        return None
+
+    def _fwd_transfer(self) -> None:
+        """Calculates the foward transfer matrix of the current frequency,
+        from the airfoil grid to the microphones.
+
         Returns:
             None.
         """
@@ -468,9 +1663,30 @@ class AmietDataGenerator:
             self._c0,
             self._Mach,
         )
-        # CSM calculation
-        self._csm = (self._G_fwd @ self._Sqq @ self._G_fwd.conj().T) * 4 * pi
-        self.__timeit("CSM has been successfully calculated!")
+        return None
+
+    def _csm_from_transfer(self, G_fwd: ndarray) -> None:
+        """Calculates the CSM from the foward transfer matrix and the source
+        CSM. In factorized mode, a low-rank factor L of the source CSM is used
+        instead, CSM = (G @ L) @ (G @ L)^H, which avoids the products with the
+        full source CSM.
+
+        Args:
+            G_fwd (ndarray): Foward transfer matrix, with shape (M, Nx * Ny).
+
+        Returns:
+            None.
+        """
+        if self.csm_rank or self.csm_energy:
+            L, self._captured_energy = low_rank_factor(
+                self._Sqq, rank=self.csm_rank, energy=self.csm_energy
+            )
+            self._csm_factor = (G_fwd @ L) * sqrt(4 * pi)
+            self._csm = self._csm_factor @ self._csm_factor.conj().T
+        else:
+            self._csm_factor, self._captured_energy = None, None
+            # CSM calculation
+            self._csm = (G_fwd @ self._Sqq @ G_fwd.conj().T) * 4 * pi
         return None
 
     def _scan_grid(self) -> None:
@@ -502,6 +1718,40 @@ class AmietDataGenerator:
         self.__timeit("Shearlayer matrix has been successfully calculated!")
         return None
 
+    def _save_shear_layer(self, hdf: File) -> None:
+        """Saves the frequency independent shearlayer matrices (foward problem
+        and scan points) to the HDF5 file.
+
+        Args:
+            hdf (h5py.File): Opened HDF5 file.
+
+        Returns:
+            None.
+        """
+        sl = hdf.create_group("Shear layer")
+        sl.create_dataset("T_sl_fwd", data=self._T_sl_fwd, dtype=float64)
+        sl.create_dataset("XYZ_sl_fwd", data=self._XYZ_sl_fwd, dtype=float64)
+        sl.create_dataset("T_sl", data=self._T_sl, dtype=float64)
+        sl.create_dataset("XYZ_sl", data=self._XYZ_sl, dtype=float64)
+        return None
+
+    def _load_shear_layer(self, sl: object) -> None:
+        """Loads the shearlayer matrices saved by a previous run, instead of
+        calculating them again.
+
+        Args:
+            sl (h5py.Group): 'Shear layer' group of the HDF5 file.
+
+        Returns:
+            None.
+        """
+        self._T_sl_fwd = sl.get("T_sl_fwd")[()]
+        self._XYZ_sl_fwd = sl.get("XYZ_sl_fwd")[()]
+        self._T_sl = sl.get("T_sl")[()]
+        self._XYZ_sl = sl.get("XYZ_sl")[()]
+        self.__timeit("Shearlayer matrices have been loaded from the data file!")
+        return None
+
     def _calculate_steering_vector(self) -> None:
         """Applies the classical beamforming algorithm to get the steering
         vector.
@@ -509,13 +1759,14 @@ class AmietDataGenerator:
         Returns:
             None.
         """
-        # Creates steering vector and beamforming filters
-        self._G_grid = zeros((self._M, self._N), "complex")
-        self._W = zeros((self._M, self._N), "complex")
+        if self.compact:
+            # Rebuilt by AmietDataReader from the shearlayer matrices.
+            self._W = None
+            return None
         # monopole grid without flow
         # G_grid = ArT.monopole3D(scan_xyz, XYZ_array, k0)
         # dipole grid with shear layer correction
-        self._G_grid = dipole_shear(
+        G_grid = dipole_shear(
             self._scan_xyz,
             self._XYZ_array,
             self._XYZ_sl,
@@ -524,72 +1775,1244 @@ class AmietDataGenerator:
             self._c0,
             self._Mach,
         )
-        # calculate beamforming filters
-        for n in range(self._N):
-            self._W[:, n] = self._G_grid[:, n] / (
-                linalg.norm(self._G_grid[:, n], ord=2) ** 2
-            )
+        # calculate beamforming filters, in place since G_grid isn't needed
+        self._W = beamforming_filters(G_grid, out=G_grid)
 
         self.__timeit("Beamforming algorithm has been successfully calculated!")
         return None
 
-    def run(self) -> None:
-        """Runs the simulation to generate the data.
+    def _pre_batch(self) -> None:
+        """Calculates the frequency independent part of the transfer matrices,
+        used by the batched kernels. As a sanity check, the kernel is compared
+        once with dipole_shear (the comparison over whole frequency lists is
+        in simple_tests/BatchedKernels_test.py).
+
+        Raises:
+            ValueError: If the batched kernel doesn't match dipole_shear (e.g.
+                another version of amiet_tools), use batch_size=1.
 
         Returns:
             None.
         """
-        hdf = File(f"{self.data_name}.h5", "a")
+        self._G0_fwd = dipole_shear(
+            self._XYZ_airfoil_calc,
+            self._XYZ_array,
+            self._XYZ_sl_fwd,
+            self._T_sl_fwd,
+            0.0,
+            self._c0,
+            self._Mach,
+        ).real
+        self._R_fwd = self._c0 * self._T_sl_fwd
+        self._G0_grid = dipole_shear(
+            self._scan_xyz,
+            self._XYZ_array,
+            self._XYZ_sl,
+            self._T_sl,
+            0.0,
+            self._c0,
+            self._Mach,
+        ).real
+        self._R_grid = self._c0 * self._T_sl
 
-        rd = hdf.create_group("Run data")
-        rd.create_dataset("date", data="{}".format(datetime.now().strftime("%d/%m/%Y")))
-        rd.create_dataset(
-            "start_time", data="{}".format(datetime.now().strftime("%H:%M:%S"))
+        k_ref = 2 * pi * 1000 / self._c0  # wavenumber of 1 kHz
+        G_ref = dipole_shear(
+            self._XYZ_airfoil_calc,
+            self._XYZ_array,
+            self._XYZ_sl_fwd,
+            self._T_sl_fwd,
+            k_ref,
+            self._c0,
+            self._Mach,
         )
+        G_block = dipole_shear_block(self._G0_fwd, self._R_fwd, [k_ref])[0]
+        if not allclose(G_block, G_ref, rtol=1e-9, atol=1e-12 * abs(G_ref).max()):
+            raise ValueError(
+                "The batched kernel doesn't match amiet_tools' dipole_shear, "
+                "use batch_size=1."
+            )
+        self.__timeit("Batched kernels have been successfully initialized!")
+        return None
 
-        fd = hdf.create_group("Frequency data")
-        fd.create_dataset("frequencies", data=array(self.frequencies), dtype=float64)
+    def _transfer_block(self) -> None:
+        """Builds the foward and scan grid transfer matrices of a block of
+        frequencies at once, and the beamforming filters of the scan grid.
 
-        self.__timeit("Starting the 'foward problem'...")
-        self._fwd_problem()
-        self.__timeit(
-            "The 'foward problem' is finished.\nEntering the frequency loop..."
-        )
-        for i in range(len(self.frequencies)):
-            self.__timeit(f"Current frequency: {self.frequencies[i]} Hz")
-            self._frequency_vars(self.frequencies[i])
-            self._pre_csm()
-            self._calculate_csm()
-            self._scan_grid()
-            self._pre_steering_vector()
-            self._calculate_steering_vector()
-            freq_x = fd.create_group(f"freq_{i}")
-            freq_x.create_dataset("frequency", data=self.frequencies[i], dtype=float64)
-            freq_x.create_dataset("steering_vector", data=self._W, dtype=complex64)
-            freq_x.create_dataset("CSM", data=self._csm, dtype=complex64)
-            self.__timeit(f"Finished {self.frequencies[i]} Hz")
-
-        rd.create_dataset(
-            "end_time", data="{}".format(datetime.now().strftime("%H:%M:%S"))
+        Returns:
+            None.
+        """
+        self._G_fwd_block = dipole_shear_block(
+            self._G0_fwd, self._R_fwd, self._k0_block
         )
-        hdf.close()
+        if self.compact:
+            self._W_block = [None] * len(self._k0_block)
+        else:
+            G_grid = dipole_shear_block(self._G0_grid, self._R_grid, self._k0_block)
+            self._W_block = beamforming_filters(G_grid, out=G_grid)
+        self.__timeit("Transfer matrices block has been successfully calculated!")
+        return None
 
-        self.__timeit("All frequencies have been calculated. Simulation as ended!")
+    def _calculate_csm_from_block(self, k: int) -> None:
+        """Calculates the CSM of the k-th frequency of the block, using its
+        transfer matrix from the block.
+
+        Args:
+            k (int): Position of the frequency in the block.
+
+        Returns:
+            None.
+        """
+        self._csm_from_transfer(self._G_fwd_block[k])
+        self.__timeit("CSM has been successfully calculated!")
         return None
 
-    def __timeit(self, message) -> None:
-        """Internal class function used for to timestamp the steps of the
-        simulation, only used if self.steps is set to True.
+    def _precompute(self, sl: object = None) -> None:
+        """Runs the steps of the simulation that don't depend on the frequency:
+        the foward problem, the scanning grid and the shearlayer matrix of the
+        scan points. They are calculated only once per run, and the shearlayer
+        matrices are loaded from the file when a previous run saved them.
 
         Args:
-            message (str): message to follow the timestamp.
+            sl (h5py.Group, optional): 'Shear layer' group of the HDF5 file.
+                Defaults to None.
 
         Returns:
-            None
+            None.
         """
-        if self.steps == True:
-            dt_obj = datetime.now()
-            t_obj = str(dt_obj.time())[:-7]
-            print(f"{t_obj} - {message}")
-            del dt_obj, t_obj
+        self.__timeit("Starting the frequency independent steps...")
+        self._run_stage("scan_grid", self._scan_grid)
+        if sl is not None:
+            self._run_stage("shear_layer", self._load_shear_layer, sl)
+        else:
+            self._run_stage("forward_problem", self._fwd_problem)
+            self._run_stage("shear_layer", self._pre_steering_vector)
+        if self.batch_size > 1:
+            self._run_stage("batch_geometry", self._pre_batch)
+        self._precomputed = True
+        self.__timeit("The frequency independent steps are finished.")
+        return None
+
+    def _frequency_result(self, steering_vector: ndarray) -> AmietFrequencyData:
+        """Gathers the data of the current frequency, in the precision used
+        in the HDF5 file.
+
+        Args:
+            steering_vector (ndarray): Beamforming filters of the frequency,
+                with shape (M, N), or None in compact mode.
+
+        Returns:
+            AmietFrequencyData: Data of the frequency.
+        """
+        # CSM for Acoular: (number of frequencies, numchannels, numchannels).
+        csm = zeros((2,) + self._csm.shape, dtype=complex64)
+        csm[1] = self._csm
+        factor = self._csm_factor
+        return AmietFrequencyData(
+            self._frequency,
+            (
+                None
+                if steering_vector is None
+                else transpose(steering_vector.astype(complex64))
+            ),
+            csm,
+            None if factor is None else factor.astype(complex64),
+            self._captured_energy,
+        )
+
+    def _compute_frequency(self, frequency: float) -> AmietFrequencyData:
+        """Runs all the frequency dependent steps of the simulation. Needs
+        self._precompute() to be called before.
+
+        Args:
+            frequency (float): Frequency to be calculated.
+
+        Returns:
+            AmietFrequencyData: Data of the frequency.
+        """
+        self._source_stage(frequency)
+        return self._array_stage()
+
+    def _source_stage(self, frequency: float) -> None:
+        """Runs the frequency dependent steps that don't depend on the
+        microphone array: FrequencyVars, spanwise gust wavenumbers, turbulence
+        spectrum and source CSM.
+
+        Args:
+            frequency (float): Frequency to be calculated.
+
+        Returns:
+            None.
+        """
+        self.__timeit(f"Current frequency: {frequency} Hz")
+        self._run_stage("frequency_vars", self._frequency_vars, frequency)
+        self._run_stage("pre_csm", self._pre_csm)
         return None
+
+    def _array_stage(self) -> AmietFrequencyData:
+        """Runs the frequency dependent steps that depend on the microphone
+        array (CSM and steering vector), after self._source_stage().
+
+        Returns:
+            AmietFrequencyData: Data of the frequency.
+        """
+        self._run_stage("csm", self._calculate_csm)
+        self._run_stage("steering_vector", self._calculate_steering_vector)
+        return self._frequency_result(self._W)
+
+    def _share_source(self, other: object) -> None:
+        """Uses the source side results of the current frequency calculated by
+        another generator with the same TestSetup and AirfoilGeom, instead of
+        calculating them again.
+
+        Args:
+            other (AmietDataGenerator): Generator that ran _source_stage().
+
+        Returns:
+            None.
+        """
+        self._share_frequency_vars(other)
+        self._Ky = other._Ky
+        self._Phi2 = other._Phi2
+        self._Sqq = other._Sqq
+        self.Sqq_dxy = other.Sqq_dxy
+        return None
+
+    def _share_frequency_vars(self, other: object) -> None:
+        """Uses the FrequencyVars of the current frequency calculated by
+        another generator with the same flow (Ux and c0).
+
+        Args:
+            other (AmietDataGenerator): Generator that ran _frequency_vars().
+
+        Returns:
+            None.
+        """
+        self._frequency = other._frequency
+        self._FreqVars = other._FreqVars
+        self._k0 = other._k0
+        self._Kx = other._Kx
+        self._Ky_crit = other._Ky_crit
+        return None
+
+    def _share_geometry(self, other: object) -> None:
+        """Uses the frequency independent results (scanning grid and
+        shearlayer matrices) of another generator with the same airfoil,
+        array, scan grid and flow, instead of calculating them again.
+
+        Args:
+            other (AmietDataGenerator): Generator that ran _precompute().
+
+        Returns:
+            None.
+        """
+        self._N = other._N
+        self._scan_xyz = other._scan_xyz
+        self._T_sl_fwd = other._T_sl_fwd
+        self._XYZ_sl_fwd = other._XYZ_sl_fwd
+        self._T_sl = other._T_sl
+        self._XYZ_sl = other._XYZ_sl
+        self._precomputed = True
+        return None
+
+    def _compute_block(self, frequencies: list) -> List[AmietFrequencyData]:
+        """Runs the frequency dependent steps of the simulation for a block of
+        frequencies. The transfer matrices and steering vectors of the whole
+        block are calculated at once, while the source CSMs (the largest
+        matrices) and the CSMs are calculated one frequency at a time. Needs
+        self._precompute() to be called before.
+
+        Args:
+            frequencies (list): Frequencies to be calculated, at most
+                self.batch_size.
+
+        Returns:
+            List[AmietFrequencyData]: Data of each frequency.
+        """
+        if self.batch_size <= 1:
+            return [self._compute_frequency(frequency) for frequency in frequencies]
+
+        # FrequencyVars of the whole block, needed to build the transfer
+        # matrices before the source CSM of each frequency.
+        freq_vars = []
+        for frequency in frequencies:
+            self._run_stage("frequency_vars", self._frequency_vars, frequency)
+            freq_vars.append(
+                (self._frequency, self._FreqVars, self._k0, self._Kx, self._Ky_crit)
+            )
+        self._k0_block = array([k0 for _, _, k0, _, _ in freq_vars])
+        self._run_stage("transfer_block", self._transfer_block)
+
+        results = []
+        for k, variables in enumerate(freq_vars):
+            (
+                self._frequency,
+                self._FreqVars,
+                self._k0,
+                self._Kx,
+                self._Ky_crit,
+            ) = variables
+            self.__timeit(f"Current frequency: {self._frequency} Hz")
+            # The source CSM is the largest matrix, so only one is kept.
+            self._run_stage("pre_csm", self._pre_csm)
+            self._run_stage("csm", self._calculate_csm_from_block, k)
+            results.append(self._frequency_result(self._W_block[k]))
+        return results
+
+    def _append_frequencies(self, fd: object) -> None:
+        """Adds the frequencies that aren't in the HDF5 file yet to the end of
+        its 'frequencies' index, growing it in place. Frequencies are compared
+        with the tolerances of FrequencyIndex, so values calculated again
+        (e.g. by frequency_by_kc) aren't added twice.
+
+        Args:
+            fd (h5py.Group): 'Frequency data' group of the HDF5 file.
+
+        Returns:
+            None.
+        """
+        stored = fd.get("frequencies")[()]
+        known = FrequencyIndex(stored)
+        new = []
+        for frequency in array(self.frequencies, dtype=float64):
+            if frequency not in known and frequency not in FrequencyIndex(new):
+                new.append(frequency)
+        if not new:
+            return None
+        if fd.get("frequencies").maxshape[0] is not None:
+            # Files created before the index was resizable.
+            del fd["frequencies"]
+            fd.create_dataset(
+                "frequencies", data=stored, dtype=float64, maxshape=(None,)
+            )
+        index = fd.get("frequencies")
+        index.resize((len(stored) + len(new),))
+        index[len(stored) :] = new
+        if _layout_version(fd) == 2:
+            # The stacked datasets grow when the new frequencies are written.
+            fd.get("completed").resize((len(stored) + len(new),))
+        self.__timeit(f"{len(new)} new frequencies added to the data file.")
+        return None
+
+    def _write_frequency(
+        self, fd: object, i: int, frequency_data: AmietFrequencyData
+    ) -> None:
+        """Saves the data of one frequency to the HDF5 file, in the layout of
+        the file.
+
+        Args:
+            fd (h5py.Group): 'Frequency data' group of the HDF5 file.
+            i (int): Position of the frequency in the 'frequencies' index.
+            frequency_data (AmietFrequencyData): Data of the frequency.
+
+        Returns:
+            None.
+        """
+        if _layout_version(fd) == 2:
+            self._write_frequency_v2(fd, i, frequency_data)
+        else:
+            self._write_frequency_v1(fd, i, frequency_data)
+        fd.file.flush()
+        return None
+
+    def _write_frequency_v2(
+        self, fd: object, i: int, frequency_data: AmietFrequencyData
+    ) -> None:
+        """Saves the data of one frequency as the i-th entry of the stacked
+        datasets. The frequency is marked in the 'completed' mask only after
+        its data is flushed, so an interrupted write is never taken as a
+        complete frequency.
+
+        Args:
+            fd (h5py.Group): 'Frequency data' group of the HDF5 file.
+            i (int): Position of the frequency in the 'frequencies' index.
+            frequency_data (AmietFrequencyData): Data of the frequency.
+
+        Returns:
+            None.
+        """
+        if frequency_data.steering_vector is not None:
+            steering_vector = transpose(frequency_data.steering_vector)
+            _write_stacked(
+                fd,
+                "steering_vector",
+                i,
+                steering_vector.astype(complex64),
+                self._storage_options(
+                    steering_vector.shape, column_blocks=True, chunked=True
+                ),
+            )
+        if self.csm_format == "factor":
+            name, csm = "CSM_factor", frequency_data.csm_factor
+        elif self.csm_format == "packed":
+            name, csm = "CSM_packed", pack_hermitian(frequency_data.csm[1])
+        else:
+            name, csm = "CSM", frequency_data.csm[1]
+        _write_stacked(
+            fd, name, i, csm.astype(complex64), self._storage_options(csm.shape)
+        )
+        if frequency_data.captured_energy is not None:
+            _write_stacked(
+                fd, "CSM_energy", i, array(frequency_data.captured_energy), {}
+            )
+        fd.file.flush()
+        fd.get("completed")[i] = True
+        return None
+
+    def _write_frequency_v1(
+        self, fd: object, i: int, frequency_data: AmietFrequencyData
+    ) -> None:
+        """Saves the data of one frequency as the group freq_i. The group only
+        gets its final name when all datasets are written, so an interrupted
+        write is never taken as a complete frequency.
+
+        Args:
+            fd (h5py.Group): 'Frequency data' group of the HDF5 file.
+            i (int): Position of the frequency in the 'frequencies' index.
+            frequency_data (AmietFrequencyData): Data of the frequency.
+
+        Returns:
+            None.
+        """
+        freq_x = fd.create_group(f"freq_{i}.partial")
+        freq_x.create_dataset("frequency", data=frequency_data.frequency, dtype=float64)
+        if frequency_data.steering_vector is not None:
+            steering_vector = transpose(frequency_data.steering_vector)
+            freq_x.create_dataset(
+                "steering_vector",
+                data=steering_vector,
+                dtype=complex64,
+                **self._storage_options(steering_vector.shape, column_blocks=True),
+            )
+        if self.csm_format == "factor":
+            freq_x.create_dataset(
+                "CSM_factor",
+                data=frequency_data.csm_factor,
+                dtype=complex64,
+                **self._storage_options(frequency_data.csm_factor.shape),
+            )
+        elif self.csm_format == "packed":
+            packed = pack_hermitian(frequency_data.csm[1])
+            freq_x.create_dataset(
+                "CSM_packed",
+                data=packed,
+                dtype=complex64,
+                **self._storage_options(packed.shape),
+            )
+        else:
+            freq_x.create_dataset(
+                "CSM",
+                data=frequency_data.csm[1],
+                dtype=complex64,
+                **self._storage_options(frequency_data.csm[1].shape),
+            )
+        if frequency_data.captured_energy is not None:
+            freq_x.create_dataset(
+                "CSM_energy", data=frequency_data.captured_energy, dtype=float64
+            )
+        fd.move(f"freq_{i}.partial", f"freq_{i}")
+        return None
+
+    def _storage_options(
+        self, shape: tuple, column_blocks: bool = False, chunked: bool = False
+    ) -> Dict:
+        """HDF5 storage options (chunks and filters) of a frequency dataset.
+
+        Args:
+            shape (tuple): Shape of the dataset.
+            column_blocks (bool, optional): If True, the dataset is chunked in
+                blocks of self.chunk_points columns (scan points). Otherwise a
+                filtered dataset is saved as a single chunk. Defaults to False.
+            chunked (bool, optional): If True, the dataset is always chunked
+                (e.g. the stacked datasets of layout v2), so column blocks are
+                used even without chunk_points or filters. Defaults to False.
+
+        Returns:
+            Dict: Keyword arguments of h5py's create_dataset.
+        """
+        filtered = bool(self.compression or self.shuffle or self.fletcher32)
+        options = {}
+        if column_blocks and (self.chunk_points or filtered or chunked):
+            points = min(self.chunk_points or 1024, shape[-1])
+            options["chunks"] = tuple(shape[:-1]) + (points,)
+        elif filtered:
+            options["chunks"] = tuple(shape)
+        if self.compression:
+            options["compression"] = self.compression
+            options["compression_opts"] = self.compression_opts
+        if self.shuffle:
+            options["shuffle"] = True
+        if self.fletcher32:
+            options["fletcher32"] = True
+        return options
+
+    def _completed_frequencies(self, fd: object) -> set:
+        """Finds the frequencies that are already complete in the HDF5 file,
+        and removes the groups left by an interrupted write (layout v1).
+
+        Args:
+            fd (h5py.Group): 'Frequency data' group of the HDF5 file.
+
+        Returns:
+            set: Positions (i in freq_i) of the complete frequencies.
+        """
+        if _layout_version(fd) == 2:
+            return set(int(i) for i in flatnonzero(fd.get("completed")[()]))
+        completed = set()
+        for name in list(fd.keys()):
+            if name.endswith(".partial"):
+                del fd[name]
+            elif name.startswith("freq_"):
+                completed.add(int(name[len("freq_") :]))
+        return completed
+
+    def _parallel_blocks(
+        self, blocks: List[list], workers: int
+    ) -> Iterator[List[AmietFrequencyData]]:
+        """Spreads the blocks of frequencies over a pool of processes and
+        yields the results in the same order as the given blocks. Only a
+        couple of tasks per worker are kept in flight, to limit the memory
+        used by results waiting to be written.
+
+        Args:
+            blocks (List[list]): Blocks of frequencies to be calculated.
+            workers (int): Number of worker processes.
+
+        Yields:
+            List[AmietFrequencyData]: Data of each frequency of a block.
+        """
+
+        def collect(future) -> List[AmietFrequencyData]:
+            results, timings = future.result()
+            for stage, seconds in timings.items():
+                self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+            return results
+
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(self,)
+        ) as pool:
+            pending = deque()
+            for block in blocks:
+                pending.append(pool.submit(_compute_block, block))
+                if len(pending) >= 2 * workers:
+                    yield collect(pending.popleft())
+            while pending:
+                yield collect(pending.popleft())
+
+    def iter_frequencies(
+        self, frequencies: list = None, workers: int = None
+    ) -> Iterator[AmietFrequencyData]:
+        """Calculates the frequencies and yields their data one at a time,
+        without writing anything to the disk. Only the data of the current
+        block of frequencies (or a couple per worker, in a parallel run) is
+        kept in memory.
+
+        Args:
+            frequencies (list, optional): Frequencies to be calculated.
+                Defaults to None (self.frequencies).
+            workers (int, optional): Number of processes used to calculate the
+                frequencies, as in self.run(). Defaults to None (serial).
+
+        Yields:
+            AmietFrequencyData: Data of each frequency, in the same format
+                given by AmietDataReader.get_frequency_data().
+        """
+        if frequencies is None:
+            frequencies = self.frequencies
+        frequencies = list(frequencies)
+        if frequencies and not self._precomputed:
+            self._precompute()
+        size = max(1, self.batch_size)
+        blocks = [frequencies[i : i + size] for i in range(0, len(frequencies), size)]
+        if workers is not None and workers > 1:
+            results = self._parallel_blocks(blocks, workers)
+        else:
+            results = map(self._compute_block, blocks)
+        yield from chain.from_iterable(results)
+
+    def run(self, workers: int = None) -> None:
+        """Runs the simulation to generate the data, saving each frequency to
+        the HDF5 file as soon as it's calculated by self.iter_frequencies().
+
+        Args:
+            workers (int, optional): Number of processes used to calculate the
+                frequencies. Each worker uses its own BLAS threads, so it's
+                advised to limit them (e.g. OPENBLAS_NUM_THREADS=1). The HDF5
+                file is written only by the main process. Defaults to None
+                (serial run).
+
+        After the run, self.timings holds the seconds spent on each stage
+        (summed over the workers in a parallel run).
+
+        Returns:
+            None.
+        """
+        self.timings = {}
+        writer, stored, missing = self._open_data_file()
+        try:
+            # Frequencies arrive in the order of the missing ones, so the freq_i
+            # groups don't depend on the number of workers.
+            for i, frequency_data in zip(
+                missing, self.iter_frequencies([stored[i] for i in missing], workers)
+            ):
+                self._save_frequency(writer, i, frequency_data)
+            self._finish_data_file(writer)
+        finally:
+            writer.close()
+        return None
+
+    def _open_data_file(
+        self, precompute: bool = True
+    ) -> Tuple[AmietDataWriter, ndarray, list]:
+        """Opens the HDF5 file for a run, creating the run and frequency
+        groups if needed, and finds the frequencies that are still missing.
+        The frequency independent steps are calculated if any is missing.
+
+        Args:
+            precompute (bool, optional): If False, the frequency independent
+                steps are left to the caller. Defaults to True.
+
+        Raises:
+            ValueError: If the frequencies stored in the file differ from the
+                current ones (except in 'append' mode), or the file was
+                written with other storage options (compact or csm_format).
+
+        Returns:
+            Tuple[AmietDataWriter, ndarray, list]: writer of the opened HDF5
+                file, frequencies index of the file and positions (i in
+                freq_i) of the missing frequencies.
+        """
+        writer = self._init_data_file()
+        hdf = writer.file
+
+        if "Run data" not in hdf:
+            writer.write_metadata(
+                {
+                    "Run data": {
+                        "date": (datetime.now().strftime("%d/%m/%Y"), None),
+                        "start_time": (datetime.now().strftime("%H:%M:%S"), None),
+                    }
+                }
+            )
+
+        fd = hdf.get("Frequency data")
+        if fd is None:
+            fd = hdf.create_group("Frequency data")
+            fd.attrs["compact"] = self.compact
+            fd.attrs["csm_format"] = self.csm_format
+            fd.create_dataset(
+                "frequencies",
+                data=array(self.frequencies),
+                dtype=float64,
+                maxshape=(None,),
+            )
+            if self.layout == 2:
+                fd.attrs["layout_version"] = 2
+                # Completion mask, set only after the data of a frequency.
+                fd.create_dataset(
+                    "completed",
+                    data=zeros(len(self.frequencies), dtype=bool),
+                    maxshape=(None,),
+                )
+        else:
+            try:
+                self._check_storage(fd)
+            except ValueError:
+                writer.close()
+                raise
+            if self.mode == "append":
+                self._append_frequencies(fd)
+            elif not array_equal(
+                fd.get("frequencies")[()], array(self.frequencies, dtype=float64)
+            ):
+                writer.close()
+                raise ValueError(
+                    "The frequencies stored in the file differ from the current ones."
+                )
+        stored = fd.get("frequencies")[()]
+        # Positions (i in freq_i) of the frequencies that are still missing.
+        completed = self._completed_frequencies(fd)
+        missing = [i for i in range(len(stored)) if i not in completed]
+        self.__timeit(
+            f"{len(completed)} frequencies already in the file, "
+            f"{len(missing)} to be calculated."
+        )
+
+        if missing and precompute and not self._precomputed:
+            self._precompute(hdf.get("Shear layer"))
+        if missing and self._precomputed:
+            self._keep_shear_layer(hdf)
+        return (writer, stored, missing)
+
+    def _keep_shear_layer(self, hdf: File) -> None:
+        """Saves the shearlayer matrices to the HDF5 file, if
+        self.store_shear_layer or self.compact is set and they aren't there
+        yet.
+
+        Args:
+            hdf (h5py.File): Opened HDF5 file.
+
+        Returns:
+            None.
+        """
+        if (self.store_shear_layer or self.compact) and "Shear layer" not in hdf:
+            self._save_shear_layer(hdf)
+        return None
+
+    def _save_frequency(
+        self, writer: AmietDataWriter, i: int, frequency_data: AmietFrequencyData
+    ) -> None:
+        """Queues the data of one frequency to be saved by the background
+        thread of the writer, while the next frequencies are calculated.
+
+        Args:
+            writer (AmietDataWriter): Writer from self._open_data_file().
+            i (int): Position of the frequency in the 'frequencies' index.
+            frequency_data (AmietFrequencyData): Data of the frequency.
+
+        Returns:
+            None.
+        """
+        writer.submit(
+            self._run_stage,
+            "write",
+            self._write_frequency,
+            writer.file.get("Frequency data"),
+            i,
+            frequency_data,
+        )
+        self.__timeit(f"Finished {frequency_data.frequency} Hz")
+        return None
+
+    def _finish_data_file(self, writer: AmietDataWriter) -> None:
+        """Waits for the queued frequencies and saves the end time of the run
+        to the HDF5 file.
+
+        Args:
+            writer (AmietDataWriter): Writer from self._open_data_file().
+
+        Returns:
+            None.
+        """
+        writer.flush()
+        rd = writer.file.get("Run data")
+        if "end_time" in rd:
+            # Saved as a dataset by older versions.
+            del rd["end_time"]
+        rd.attrs["end_time"] = datetime.now().strftime("%H:%M:%S")
+        self.__timeit("All frequencies have been calculated. Simulation as ended!")
+        self.__timeit(
+            "Time per stage: "
+            + ", ".join(f"{k} = {v:.3f} s" for k, v in self.timings.items())
+        )
+        return None
+
+    def __timeit(self, message) -> None:
+        """Internal class function used for to timestamp the steps of the
+        simulation, only used if self.steps is set to True.
+
+        Args:
+            message (str): message to follow the timestamp.
+
+        Returns:
+            None
+        """
+        if self.steps == True:
+            dt_obj = datetime.now()
+            t_obj = str(dt_obj.time())[:-7]
+            print(f"{t_obj} - {message}")
+            del dt_obj, t_obj
+        return None
+
+
+@dataclass
+class __BasicMultiGenerator:
+    """Basic class for the generators that run several AmietDataGenerator
+    objects together, sharing part of the calculations between them. Each one
+    saves its own HDF5 file. Shouldn't be used directly, the subclasses define
+    _compute(frequency, indices), which calculates the data of one frequency
+    for some of the generators as {position: AmietFrequencyData}.
+
+    Attributes:
+        generators (List[AmietDataGenerator]): Generators run together.
+        timings (Dict[str, float]): Time spent in each stage of the last run,
+            summed over all the generators.
+    """
+
+    def _prepare(self, k: int) -> None:
+        """Runs (or shares) the frequency independent steps of a generator.
+
+        Args:
+            k (int): Position of the generator in self.generators.
+
+        Returns:
+            None.
+        """
+        if not self.generators[k]._precomputed:
+            self.generators[k]._precompute()
+        return None
+
+    def _open(self, k: int) -> Tuple[AmietDataWriter, ndarray, list]:
+        """Opens the HDF5 file of a generator for a run.
+
+        Args:
+            k (int): Position of the generator in self.generators.
+
+        Returns:
+            Tuple[AmietDataWriter, ndarray, list]: see
+                AmietDataGenerator._open_data_file().
+        """
+        return self.generators[k]._open_data_file()
+
+    def _collect_timings(self) -> None:
+        """Sums the time spent in each stage by all the generators into
+        self.timings.
+
+        Returns:
+            None.
+        """
+        self.timings = {}
+        for generator in self.generators:
+            for stage, elapsed in generator.timings.items():
+                self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
+        return None
+
+    def iter_frequencies(
+        self, frequencies: list = None
+    ) -> Iterator[List[AmietFrequencyData]]:
+        """Calculates the data of all the generators frequency by frequency,
+        without saving it.
+
+        Args:
+            frequencies (list, optional): Frequencies to be calculated.
+                Defaults to None, which uses self.frequencies.
+
+        Yields:
+            List[AmietFrequencyData]: Data of the frequency for each
+                generator, in the order of self.generators.
+        """
+        if frequencies is None:
+            frequencies = self.frequencies
+        indices = list(range(len(self.generators)))
+        for k in indices:
+            self._prepare(k)
+        for frequency in frequencies:
+            frequency_data = self._compute(frequency, indices)
+            self._collect_timings()
+            yield [frequency_data[k] for k in indices]
+
+    def run(self) -> None:
+        """Runs the simulation of all the generators, saving each one to its
+        own HDF5 file. Frequencies already in every file (mode="resume" or
+        "append") are skipped, and the ones missing only in some files are
+        calculated just for those generators.
+
+        Returns:
+            None.
+        """
+        for generator in self.generators:
+            generator.timings = {}
+        opened = []
+        try:
+            for k in range(len(self.generators)):
+                opened.append(self._open(k))
+            # Generators (and freq_i position) that still need each frequency.
+            needed = {}
+            for k, (_, stored, missing) in enumerate(opened):
+                for i in missing:
+                    needed.setdefault(float(stored[i]), []).append((k, i))
+
+            for frequency, targets in needed.items():
+                frequency_data = self._compute(frequency, [k for k, _ in targets])
+                for k, i in targets:
+                    self.generators[k]._save_frequency(
+                        opened[k][0], i, frequency_data[k]
+                    )
+
+            for generator, (writer, _, _) in zip(self.generators, opened):
+                generator._finish_data_file(writer)
+        finally:
+            for writer, _, _ in opened:
+                writer.close()
+        self._collect_timings()
+        self.__timeit(
+            "Time per stage (all files): "
+            + ", ".join(f"{k} = {v:.3f} s" for k, v in self.timings.items())
+        )
+        return None
+
+    def __timeit(self, message) -> None:
+        """Internal class function used for to timestamp the steps of the
+        simulation, only used if self.steps is set to True.
+
+        Args:
+            message (str): message to follow the timestamp.
+
+        Returns:
+            None
+        """
+        if self.steps == True:
+            dt_obj = datetime.now()
+            t_obj = str(dt_obj.time())[:-7]
+            print(f"{t_obj} - {message}")
+            del dt_obj, t_obj
+        return None
+
+
+@dataclass
+class AmietMultiArrayGenerator(__BasicMultiGenerator):
+    """Class used to generate the AmietData of several microphone arrays for
+    the same airfoil, flow and scan grid. The frequency dependent steps that
+    don't depend on the microphones (FrequencyVars, spanwise gust wavenumbers,
+    turbulence spectrum and source CSM) are calculated once per frequency and
+    shared by all the arrays, with one HDF5 file per array.
+
+    Args:
+        test_setup (TestSetup): amiet_tools TestSetup object.
+        airfoil_geom (AirfoilGeom): amiet_tools AirfoilGeom object.
+        mic_arrays (list): List of acoular MicGeom objects.
+        frequencies (list): List of frequencies to be calculated.
+        distance (float): Custom height for all the arrays.
+        scan_length (list): Grid size for x and y.
+        scan_spacing (list): Grid spacing for x and y.
+        data_names (list): File names (with path) of each array data, without
+            the .h5 extension.
+        steps (bool, optional): Enables console current step notice. Defaults
+            to False.
+        options (dict, optional): Other AmietDataGenerator arguments used for
+            every array, e.g. {"mode": "resume"}. The frequencies are always
+            calculated one at a time, so "batch_size" isn't used. Defaults to
+            None.
+
+    Attributes:
+        generators (List[AmietDataGenerator]): Generator of each array.
+        timings (Dict[str, float]): Time spent in each stage of the last run,
+            summed over all the arrays.
+    """
+
+    test_setup: object
+    airfoil_geom: object
+    mic_arrays: list
+    frequencies: list
+    distance: float
+    scan_length: list
+    scan_spacing: list
+    data_names: list
+    steps: bool = False
+    options: dict = None
+
+    def __post_init__(self):
+        """Creates one AmietDataGenerator per array.
+
+        Raises:
+            ValueError: If the number of file names differs from the number of
+                arrays.
+        """
+        if len(self.data_names) != len(self.mic_arrays):
+            raise ValueError("One data name per microphone array is needed.")
+        self.generators = [
+            AmietDataGenerator(
+                self.test_setup,
+                self.airfoil_geom,
+                mic_array,
+                self.frequencies,
+                self.distance,
+                self.scan_length,
+                self.scan_spacing,
+                data_name,
+                self.steps,
+                **(self.options or {}),
+            )
+            for mic_array, data_name in zip(self.mic_arrays, self.data_names)
+        ]
+        self.timings = {}
+
+    def _compute(
+        self, frequency: float, indices: list
+    ) -> Dict[int, AmietFrequencyData]:
+        """Calculates the array independent steps of a frequency with the
+        first generator, and the CSM and steering vector of each array.
+
+        Args:
+            frequency (float): Frequency to be calculated.
+            indices (list): Positions of the arrays in self.mic_arrays.
+
+        Returns:
+            Dict[int, AmietFrequencyData]: Data of each array position.
+        """
+        leader = self.generators[0]
+        leader._source_stage(frequency)
+        frequency_data = {}
+        for k in indices:
+            if k != 0:
+                self.generators[k]._share_source(leader)
+            frequency_data[k] = self.generators[k]._array_stage()
+        return frequency_data
+
+
+@dataclass
+class AmietSweepGenerator(__BasicMultiGenerator):
+    """Class used to generate the AmietData of a sweep over the flow
+    conditions of the TestSetup, for the same airfoil, array and scan grid.
+    One HDF5 file is saved per sweep point, with the point values in its
+    TestSetup group.
+
+    Points that differ only in the source parameters (turb_intensity and
+    length_scale) share the shearlayer matrices, transfer matrices and
+    steering vectors, and only the turbulence spectrum, source CSM and CSM are
+    calculated for each one. Any other parameter (e.g. Ux) changes the whole
+    simulation.
+
+    Args:
+        test_setup (TestSetup): amiet_tools TestSetup object, with the values
+            of the parameters that aren't swept.
+        airfoil_geom (AirfoilGeom): amiet_tools AirfoilGeom object.
+        mic_array (MicGeom): acoular MicGeom object.
+        frequencies (list): List of frequencies to be calculated.
+        distance (float): Custom height for the array.
+        scan_length (list): Grid size for x and y.
+        scan_spacing (list): Grid spacing for x and y.
+        sweep (dict): Values of each swept TestSetup parameter, e.g.
+            {"Ux": [40, 60], "turb_intensity": [0.02, 0.025, 0.03]}. Every
+            combination of the values is a sweep point.
+        data_name (str, optional): Prefix of the files names, the point k
+            is saved as '{data_name}_{k}.h5'. Defaults to 'Unknown'.
+        steps (bool, optional): Enables console current step notice. Defaults
+            to False.
+        options (dict, optional): Other AmietDataGenerator arguments used for
+            every point, e.g. {"mode": "resume"}. The frequencies are always
+            calculated one at a time, so "batch_size" isn't used. Defaults to
+            None.
+
+    Attributes:
+        points (List[dict]): Parameters values of each sweep point.
+        generators (List[AmietDataGenerator]): Generator of each point.
+        timings (Dict[str, float]): Time spent in each stage of the last run,
+            summed over all the points.
+    """
+
+    test_setup: object
+    airfoil_geom: object
+    mic_array: object
+    frequencies: list
+    distance: float
+    scan_length: list
+    scan_spacing: list
+    sweep: dict
+    data_name: str = "Unknown"
+    steps: bool = False
+    options: dict = None
+
+    # TestSetup parameters that can be swept.
+    setup_parameters = (
+        "c0",
+        "rho0",
+        "p_ref",
+        "Ux",
+        "turb_intensity",
+        "length_scale",
+        "z_sl",
+    )
+    # TestSetup parameters that only change the turbulence spectrum and the
+    # source CSM.
+    source_parameters = ("turb_intensity", "length_scale")
+
+    def __post_init__(self):
+        """Creates one AmietDataGenerator per sweep point, and groups the
+        points that share the flow (all but the source parameters).
+
+        Raises:
+            ValueError: If a swept parameter isn't a TestSetup parameter.
+        """
+        for name in self.sweep:
+            if name not in self.setup_parameters:
+                raise ValueError(f"'{name}' isn't a TestSetup parameter.")
+        names = list(self.sweep)
+        self.points = [
+            dict(zip(names, values)) for values in product(*self.sweep.values())
+        ]
+        self.generators = [
+            AmietDataGenerator(
+                _vary_test_setup(self.test_setup, point),
+                self.airfoil_geom,
+                self.mic_array,
+                self.frequencies,
+                self.distance,
+                self.scan_length,
+                self.scan_spacing,
+                f"{self.data_name}_{k}",
+                self.steps,
+                **(self.options or {}),
+            )
+            for k, point in enumerate(self.points)
+        ]
+        # Position of the first point with the same flow as each point, which
+        # calculates the parts shared by them.
+        flows = {}
+        self._leaders = [
+            flows.setdefault(
+                tuple(
+                    (name, value)
+                    for name, value in point.items()
+                    if name not in self.source_parameters
+                ),
+                k,
+            )
+            for k, point in enumerate(self.points)
+        ]
+        self.timings = {}
+
+    def _prepare(self, k: int) -> None:
+        """Runs the frequency independent steps of the point that leads the
+        flow of point k, and shares them with it.
+
+        Args:
+            k (int): Position of the point in self.points.
+
+        Returns:
+            None.
+        """
+        leader = self.generators[self._leaders[k]]
+        if not leader._precomputed:
+            leader._precompute()
+        if self.generators[k] is not leader:
+            self.generators[k]._share_geometry(leader)
+        return None
+
+    def _open(self, k: int) -> Tuple[AmietDataWriter, ndarray, list]:
+        """Opens the HDF5 file of a sweep point for a run. The frequency
+        independent steps are shared by the points with the same flow.
+
+        Args:
+            k (int): Position of the point in self.points.
+
+        Returns:
+            Tuple[AmietDataWriter, ndarray, list]: see
+                AmietDataGenerator._open_data_file().
+        """
+        generator = self.generators[k]
+        if self._leaders[k] == k:
+            return generator._open_data_file()
+        writer, stored, missing = generator._open_data_file(precompute=False)
+        if missing:
+            self._prepare(k)
+            generator._keep_shear_layer(writer.file)
+        return (writer, stored, missing)
+
+    def _compute(
+        self, frequency: float, indices: list
+    ) -> Dict[int, AmietFrequencyData]:
+        """Calculates one frequency of some sweep points. The FrequencyVars,
+        foward transfer matrix and steering vector are calculated once per
+        flow, and the source CSM and CSM once per point, released as soon as
+        the data of the point is gathered.
+
+        Args:
+            frequency (float): Frequency to be calculated.
+            indices (list): Positions of the points in self.points.
+
+        Returns:
+            Dict[int, AmietFrequencyData]: Data of each point position.
+        """
+        frequency_data = {}
+        for lead in sorted(set(self._leaders[k] for k in indices)):
+            leader = self.generators[lead]
+            leader._run_stage("frequency_vars", leader._frequency_vars, frequency)
+            leader._run_stage("csm", leader._fwd_transfer)
+            leader._run_stage("steering_vector", leader._calculate_steering_vector)
+            for k in indices:
+                if self._leaders[k] != lead:
+                    continue
+                generator = self.generators[k]
+                generator._share_frequency_vars(leader)
+                generator._run_stage("pre_csm", generator._pre_csm)
+                generator._run_stage("csm", generator._csm_from_transfer, leader._G_fwd)
+                frequency_data[k] = generator._frequency_result(leader._W)
+                # Copied to the result, so only one source CSM of the sweep is
+                # held in memory at a time.
+                generator._Sqq, generator._csm, generator._csm_factor = (None,) * 3
+        return frequency_data
+
+
+def _vary_test_setup(test_setup: object, changes: dict) -> object:
+    """Copies a TestSetup object with some of its parameters changed, and
+    updates the flow parameters that depend on them.
+
+    Args:
+        test_setup (TestSetup): amiet_tools TestSetup object.
+        changes (dict): New values of the parameters.
+
+    Returns:
+        TestSetup: changed copy of the TestSetup object.
+    """
+    setup = copy(test_setup)
+    for name, value in changes.items():
+        setattr(setup, name, value)
+    if hasattr(setup, "_calc_secondary_vars"):
+        setup._calc_secondary_vars()
+    else:
+        setup.Mach = setup.Ux / setup.c0
+        setup.beta = sqrt(1 - setup.Mach**2)
+    return setup
+
+
+def convert_to_v2(file_name: str, new_file_name: str) -> None:
+    """Converts an AmietData file with one freq_i group per frequency (layout
+    v1) to the stacked layout v2, keeping the storage options of the
+    datasets. Frequencies without a complete group are marked as not
+    completed, so the new file can be finished with mode='resume'.
+
+    Args:
+        file_name (str): Name of the layout v1 HDF5 file.
+        new_file_name (str): Name of the layout v2 HDF5 file to be created.
+
+    Raises:
+        ValueError: If the file already uses the layout v2.
+
+    Returns:
+        None.
+    """
+    source = File(file_name, "r")
+    if _layout_version(source.get("Frequency data")) == 2:
+        source.close()
+        raise ValueError(f"'{file_name}' already uses the layout v2.")
+    converted = File(new_file_name, "w")
+    try:
+        for name in source:
+            if name != "Frequency data":
+                source.copy(source[name], converted, name=name)
+        old = source.get("Frequency data")
+        frequencies = old.get("frequencies")[()]
+        fd = converted.create_group("Frequency data")
+        fd.attrs["layout_version"] = 2
+        for name, value in _storage_attributes(old).items():
+            fd.attrs[name] = value
+        fd.create_dataset(
+            "frequencies", data=frequencies, dtype=float64, maxshape=(None,)
+        )
+        fd.create_dataset(
+            "completed", data=zeros(len(frequencies), dtype=bool), maxshape=(None,)
+        )
+        for i in range(len(frequencies)):
+            freq_x = old.get(f"freq_{i}")
+            if freq_x is None:
+                continue
+            for name in ("steering_vector", "CSM", "CSM_packed", "CSM_factor"):
+                if name in freq_x:
+                    ds = freq_x.get(name)
+                    options = {
+                        option: getattr(ds, option)
+                        for option in ("chunks", "compression", "compression_opts")
+                        if getattr(ds, option) is not None
+                    }
+                    options.update(shuffle=ds.shuffle, fletcher32=ds.fletcher32)
+                    if name == "steering_vector" and ds.chunks is None:
+                        # Column blocks, as in new layout v2 files.
+                        options["chunks"] = ds.shape[:-1] + (min(1024, ds.shape[-1]),)
+                    _write_stacked(fd, name, i, ds[()], options)
+            if "CSM_energy" in freq_x:
+                _write_stacked(fd, "CSM_energy", i, freq_x.get("CSM_energy")[()], {})
+            fd.get("completed")[i] = True
+    finally:
+        source.close()
+        converted.close()
+    return None
@@ -5,8 +5,8 @@ Dummy classes for integrating Acoular with Amiet Tools.
 @Author: Michael Markus Ackermann
 """
 
-from acoular import PowerSpectra
-from traits.api import CArray, Int
+from acoular import PowerSpectra, SteeringVector
+from traits.api import Any, CArray, Int
 
 
 class DummyPowerSpectra(PowerSpectra):
@@ -22,3 +22,17 @@ class DummyPowerSpectra(PowerSpectra):
     ind_high = Int()
     ind_low = Int()
     calib = None
+
+
+class DummySteeringVector(SteeringVector):
+    """Dummy class for acoular.SteeringVector. Used to give Acoular the
+    steering vector generated with amiet_tools, for any frequency asked.
+
+    Returns:
+        DummySteeringVector instance.
+    """
+
+    steering_vector = Any()
+
+    def steer_vector(self, f, ind=None):
+        return self.steering_vector
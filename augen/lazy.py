@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy arrays, loaded from the data files on demand
+=================
+@Author: Michael Markus Ackermann
+"""
+
+from dataclasses import dataclass
+from typing import Callable
+
+from numpy import asarray, dtype, integer, ndarray, prod
+
+
+@dataclass
+class LazyArray:
+    """Array-like proxy of an array stored in a data file, used by
+    AmietDataReader in lazy mode. Only the rows (first axis) that are indexed
+    are read, so blocks of a steering vector can be processed without ever
+    loading the full matrix. Conversion with np.asarray() loads the whole
+    array.
+
+    Args:
+        shape (tuple): Shape of the full array.
+        dtype (np.dtype): Data type of the array.
+        read_rows (Callable[[int, int], ndarray]): Function that reads the
+            rows start:stop of the array.
+
+    Returns:
+        LazyArray instance.
+    """
+
+    shape: tuple
+    dtype: dtype
+    read_rows: Callable[[int, int], ndarray]
+
+    def __post_init__(self) -> None:
+        """Normalizes the shape and the data type.
+
+        Returns:
+            None.
+        """
+        self.shape = tuple(int(n) for n in self.shape)
+        self.dtype = dtype(self.dtype)
+        return None
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(prod(self.shape))
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __repr__(self) -> str:
+        return f"LazyArray(shape={self.shape}, dtype={self.dtype})."
+
+    def __getitem__(self, key: object) -> ndarray:
+        """Reads the indexed part of the array. Integers and slices with step
+        1 on the first axis read only the selected rows; any other index reads
+        the whole array first.
+
+        Args:
+            key (object): Index, as for an np.ndarray.
+
+        Returns:
+            ndarray: Selected part of the array.
+        """
+        first, rest = (key[0], key[1:]) if isinstance(key, tuple) else (key, ())
+        if isinstance(first, slice) and first.step in (None, 1):
+            start, stop, _ = first.indices(self.shape[0])
+            rows = self.read_rows(start, max(start, stop))
+            return rows[(slice(None),) + rest] if rest else rows
+        if isinstance(first, (int, integer)):
+            row = int(first) + (self.shape[0] if first < 0 else 0)
+            if not 0 <= row < self.shape[0]:
+                raise IndexError(f"Index {first} is out of bounds for {self.shape}.")
+            return self.read_rows(row, row + 1)[(0,) + rest]
+        return asarray(self)[key]
+
+    def __array__(self, dtype: dtype = None, copy: bool = None) -> ndarray:
+        rows = self.read_rows(0, self.shape[0])
+        return rows if dtype is None else rows.astype(dtype, copy=False)
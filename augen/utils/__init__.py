@@ -5,11 +5,14 @@ Init file for the utilities sub-module.
 @Author: Michael Markus Ackermann
 """
 
+from .beam_utils import *
 from .mpl_utils import *
 from .utils import *
 from .xml_utils import *
 
 __all__ = [
+    # Classes
+    "FrequencyIndex",
     # Functions
     "draw_airfoil",
     "xml_format_array",
@@ -17,4 +20,10 @@ __all__ = [
     "truncate",
     "index_of_value",
     "frequency_by_kc",
+    "beamforming_filters",
+    "beamforming_map",
+    "dipole_shear_block",
+    "low_rank_factor",
+    "pack_hermitian",
+    "unpack_hermitian",
 ]
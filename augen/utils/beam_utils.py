@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Numerical utilities for transfer functions, steering vectors and CSMs.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+from typing import Tuple
+
+from numpy import (
+    argmax,
+    asarray,
+    complex128,
+    cos,
+    cumsum,
+    divide,
+    einsum,
+    empty,
+    fill_diagonal,
+    finfo,
+    float64,
+    hstack,
+    linalg,
+    maximum,
+    multiply,
+    ndarray,
+    negative,
+    newaxis,
+    sin,
+    sqrt,
+    triu_indices,
+)
+from numpy.random import default_rng
+
+
+def beamforming_filters(G: ndarray, out: ndarray = None) -> ndarray:
+    """Calculates the classical beamforming filters, w = g / ||g||², for all
+    the scan points (columns of the transfer matrix) at once.
+
+    Args:
+        G (np.ndarray): Transfer matrix of shape (M, N), or a stack of them
+            with shape (..., M, N).
+        out (np.ndarray, optional): Array to store the filters. It can be G
+            itself, to avoid allocating a new matrix. Defaults to None.
+
+    Returns:
+        np.ndarray: Beamforming filters, with the same shape as G.
+    """
+    # Squared norm of each column, using views of the real and imaginary parts
+    # instead of a temporary |G|² matrix.
+    norms = einsum("...mn,...mn->...n", G.real, G.real)
+    norms += einsum("...mn,...mn->...n", G.imag, G.imag)
+    return divide(G, norms[..., newaxis, :], out=out)
+
+
+def beamforming_map(
+    csm: ndarray,
+    steering_vector: ndarray,
+    tile_size: int = 4096,
+    remove_diag: bool = False,
+) -> ndarray:
+    """Calculates the delay-and-sum beamforming map, w^H @ C @ w for each scan
+    point, in tiles of scan points. Only one tile of the steering vector is
+    used at a time, so with a LazyArray (lazy AmietDataReader) the full matrix
+    is never loaded.
+
+    Args:
+        csm (np.ndarray): Cross spectral matrix, shape (M, M).
+        steering_vector (np.ndarray or LazyArray): Steering vectors of the scan
+            points, shape (N, M).
+        tile_size (int, optional): Number of scan points of each tile.
+            Defaults to 4096.
+        remove_diag (bool, optional): If True, the diagonal of the CSM is
+            removed, and negative results are set to 0. Defaults to False.
+
+    Returns:
+        np.ndarray: Beamforming map, shape (N,).
+    """
+    C = asarray(csm)
+    if remove_diag:
+        C = C.copy()
+        fill_diagonal(C, 0)
+    N = steering_vector.shape[0]
+    result = empty(N, dtype=float64)
+    for start in range(0, N, tile_size):
+        stop = min(start + tile_size, N)
+        W = asarray(steering_vector[start:stop])
+        result[start:stop] = einsum("nm,nm->n", W.conj() @ C, W).real
+    if remove_diag:
+        maximum(result, 0, out=result)
+    return result
+
+
+def dipole_shear_block(G0: ndarray, R: ndarray, k0: ndarray) -> ndarray:
+    """Calculates the dipole transfer matrices with shear layer correction for
+    a block of wavenumbers at once, as a single tensor operation.
+
+    It uses the frequency dependence of amiet_tools' dipole_shear, where only
+    the near-field and propagation terms change with the wavenumber:
+        G(k0) = G(0) * (1 + 1j * k0 * R) * exp(-1j * k0 * R),
+    in which R = c0 * T_sl is the flow-corrected propagation distance.
+
+    Args:
+        G0 (np.ndarray): Real part of the transfer matrix for k0 = 0, shape
+            (M, N), given by dipole_shear with k0 = 0 (which is real).
+        R (np.ndarray): Propagation distances c0 * T_sl, shape (M, N).
+        k0 (np.ndarray): Acoustic wavenumbers of the block, shape (K,).
+
+    Returns:
+        np.ndarray: Transfer matrices with shape (K, M, N).
+    """
+    kR = multiply.outer(asarray(k0, dtype=float), R)
+    G = empty(kR.shape, dtype=complex128)
+    # exp(-1j * k0 * R), without a complex temporary for the exponent.
+    cos(kR, out=G.real)
+    sin(kR, out=G.imag)
+    negative(G.imag, out=G.imag)
+    G *= 1 + 1j * kR
+    G *= G0
+    return G
+
+
+def low_rank_factor(
+    A: ndarray,
+    rank: int = None,
+    energy: float = None,
+    sketch_size: int = 32,
+    seed: int = 0,
+) -> Tuple[ndarray, float]:
+    """Calculates a low-rank factor L of a Hermitian positive semi-definite
+    matrix, with A ≈ L @ L^H, using a single-pass randomized Nyström
+    approximation (only one product A @ Omega is needed).
+
+    Since A - L @ L^H is positive semi-definite, 1 - captured energy is the
+    trace-norm error of the approximation, relative to trace(A).
+
+    Args:
+        A (np.ndarray): Hermitian positive semi-definite matrix, shape (n, n).
+        rank (int, optional): Number of columns of L. Defaults to None.
+        energy (float, optional): Minimum fraction of trace(A) kept by
+            L @ L^H, used when no rank is given. The sketch is doubled until
+            it's reached. Defaults to None (keeps the whole sketch).
+        sketch_size (int, optional): Initial number of random test vectors.
+            Defaults to 32.
+        seed (int, optional): Seed of the test vectors, so the factor is
+            reproducible. Defaults to 0.
+
+    Returns:
+        Tuple[np.ndarray, float]: factor L, with shape (n, r), and the fraction
+            of trace(A) captured by it.
+    """
+    n = A.shape[0]
+    total = A.trace().real
+    rng = default_rng(seed)
+    size = min(n, rank + 10 if rank else sketch_size)
+    Omega = rng.standard_normal((n, size)) + 1j * rng.standard_normal((n, size))
+    Y = A @ Omega
+    while True:
+        L, eigenvalues = _nystrom(Omega, Y)
+        captured = cumsum(eigenvalues) / total
+        if rank:
+            r = min(rank, size)
+        elif energy is None:
+            r = size
+        elif captured[-1] >= energy:
+            r = int(argmax(captured >= energy)) + 1
+        elif size == n:
+            r = size
+        else:
+            # Not enough energy in the sketch, doubles it.
+            extra = min(size, n - size)
+            Omega_extra = rng.standard_normal((n, extra)) + 1j * rng.standard_normal(
+                (n, extra)
+            )
+            Omega = hstack((Omega, Omega_extra))
+            Y = hstack((Y, A @ Omega_extra))
+            size += extra
+            continue
+        return (L[:, :r], float(min(captured[r - 1], 1.0)))
+
+
+def pack_hermitian(A: ndarray) -> ndarray:
+    """Packs the upper triangle (with the diagonal) of a Hermitian matrix,
+    row by row, which is all that's needed to rebuild it.
+
+    Args:
+        A (np.ndarray): Hermitian matrix of shape (M, M).
+
+    Returns:
+        np.ndarray: Packed upper triangle, with M * (M + 1) / 2 values.
+    """
+    return A[triu_indices(A.shape[0])]
+
+
+def unpack_hermitian(packed: ndarray, out: ndarray = None) -> ndarray:
+    """Rebuilds a Hermitian matrix from its packed upper triangle, made by
+    pack_hermitian.
+
+    Args:
+        packed (np.ndarray): Packed upper triangle, with M * (M + 1) / 2
+            values.
+        out (np.ndarray, optional): Array of shape (M, M) where the matrix is
+            written, e.g. a slice of a preallocated buffer. Defaults to None.
+
+    Returns:
+        np.ndarray: Hermitian matrix of shape (M, M).
+    """
+    M = int(round((sqrt(8 * len(packed) + 1) - 1) / 2))
+    if out is None:
+        out = empty((M, M), dtype=packed.dtype)
+    rows, cols = triu_indices(M)
+    out[cols, rows] = packed.conj()
+    # The diagonal is written last, as the stored (real) values.
+    out[rows, cols] = packed
+    return out
+
+
+def _nystrom(Omega: ndarray, Y: ndarray) -> Tuple[ndarray, ndarray]:
+    """Stabilized Nyström approximation, A ≈ L @ L^H, from the sketch
+    Y = A @ Omega of a positive semi-definite matrix.
+
+    Args:
+        Omega (np.ndarray): Test vectors, shape (n, k).
+        Y (np.ndarray): Sketch A @ Omega, shape (n, k).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: factor L, with shape (n, k), and its
+            eigenvalues (squared column norms) in decreasing order.
+    """
+    # Small shift to keep the Cholesky factorization stable.
+    shift = finfo(float64).eps * linalg.norm(Y)
+    Y_shift = Y + shift * Omega
+    core = Omega.conj().T @ Y_shift
+    C = linalg.cholesky((core + core.conj().T) / 2)
+    B = linalg.solve(C, Y_shift.conj().T).conj().T
+    U, sigma, _ = linalg.svd(B, full_matrices=False)
+    eigenvalues = maximum(sigma**2 - shift, 0)
+    return (U * sqrt(eigenvalues), eigenvalues)
@@ -5,9 +5,10 @@ General utilities.
 @Author: Michael Markus Ackermann
 """
 
+from dataclasses import dataclass
 from typing import List
 
-from numpy import array, ndarray, pi, where
+from numpy import argsort, array, asarray, float64, ndarray, pi, where
 
 
 def truncate(value: float, decimals: int = 0) -> float:
@@ -56,3 +57,125 @@ def frequency_by_kc(kc: float, b: float, c0: float = 340) -> float or ndarray:
         return round(f0, 2)
     else:
         return array([round(f, 2) for f in f0])
+
+
+@dataclass
+class FrequencyIndex:
+    """Sorted index of the frequencies of a data file, used to find them by
+    value with a tolerance (e.g. frequencies rounded by frequency_by_kc and
+    calculated again elsewhere) instead of exact float comparisons. The
+    searches are binary searches over the sorted frequencies.
+
+    Args:
+        frequencies (List[float] or np.ndarray): Frequencies, in the order of
+            the data file.
+        rtol (float, optional): Relative tolerance of the lookups. Defaults to
+            1e-6.
+        atol (float, optional): Absolute tolerance of the lookups, in Hz.
+            Defaults to 0.01, the rounding of frequency_by_kc.
+
+    Returns:
+        FrequencyIndex instance.
+    """
+
+    frequencies: List[float] or ndarray
+    rtol: float = 1e-6
+    atol: float = 0.01
+
+    def __post_init__(self) -> None:
+        """Sorts the frequencies, keeping their original positions.
+
+        Returns:
+            None.
+        """
+        self.frequencies = asarray(self.frequencies, dtype=float64)
+        self._order = argsort(self.frequencies, kind="stable")
+        self._sorted = self.frequencies[self._order]
+        return None
+
+    def __len__(self) -> int:
+        return len(self.frequencies)
+
+    def __contains__(self, frequency: float) -> bool:
+        if frequency is None or not len(self.frequencies):
+            return False
+        return self.__close(self.nearest(frequency), frequency)
+
+    def __close(self, position: int, frequency: float) -> bool:
+        """Checks if the frequency in a position matches a value within the
+        tolerances.
+
+        Args:
+            position (int): Position of the frequency in the data file.
+            frequency (float): Value to compare.
+
+        Returns:
+            bool: True if they match.
+        """
+        difference = abs(self.frequencies[position] - frequency)
+        return bool(difference <= self.atol + self.rtol * abs(frequency))
+
+    def nearest(self, frequency: float) -> int:
+        """Finds the nearest stored frequency.
+
+        Args:
+            frequency (float): Frequency to look for.
+
+        Returns:
+            int: Position of the nearest frequency in the data file.
+        """
+        k = int(self._sorted.searchsorted(frequency))
+        if k == len(self._sorted) or (
+            k > 0 and frequency - self._sorted[k - 1] <= self._sorted[k] - frequency
+        ):
+            k -= 1
+        return int(self._order[k])
+
+    def lookup(self, frequency: float) -> int:
+        """Finds a stored frequency within the tolerances.
+
+        Args:
+            frequency (float): Frequency to look for.
+
+        Raises:
+            ValueError: If no stored frequency matches (or it's None).
+
+        Returns:
+            int: Position of the frequency in the data file.
+        """
+        if frequency is not None and len(self.frequencies):
+            position = self.nearest(frequency)
+            if self.__close(position, frequency):
+                return position
+        raise ValueError(
+            f"{frequency} Hz isn't in the available frequencies: {self._sorted}."
+        )
+
+    def band(self, frequency: float, n: int = 3) -> List[int]:
+        """Finds the stored frequencies inside the 1/n-octave band centred at
+        a frequency.
+
+        Args:
+            frequency (float): Band centre frequency.
+            n (int, optional): Controls the width of the band, as in Acoular.
+                Defaults to 3 (third-octave band).
+                =  =====================
+                n  frequency band width
+                =  =====================
+                0  single frequency line
+                1  octave band
+                3  third-octave band
+                n  1/n-octave band
+                =  =====================
+
+        Returns:
+            List[int]: Positions in the data file of the frequencies in the
+                band, in increasing frequency.
+        """
+        if n == 0:
+            return [self.lookup(frequency)] if frequency in self else []
+        low = frequency * 2 ** (-1 / (2 * n))
+        high = frequency * 2 ** (1 / (2 * n))
+        start = int(self._sorted.searchsorted(low, side="left"))
+        stop = int(self._sorted.searchsorted(high, side="right"))
+        return [int(k) for k in self._order[start:stop]]
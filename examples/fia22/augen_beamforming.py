@@ -78,7 +78,7 @@ for j in range(len(h5_file_loc)):
     # Applies beamforming for each frequency
     xs, ys, apls = [], [], []
     for f in freqs:
-        csm, w = get_frequency_data(h5_file_loc[j], freqs, f)
+        csm, w = get_frequency_data(h5_file_loc[j], f)
         x, y, apl = conventional_bf(w, csm)
         xs.append(x)
         ys.append(y)
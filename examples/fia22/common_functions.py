@@ -5,29 +5,26 @@ Common functions for plotting figures for the FIA22 Article.
 @Author: Michael Markus Ackermann
 """
 from amiet_tools import rect_grid
-from augen.utils import index_of_value
-from h5py import File
+from augen import AmietDataReader
 from numpy import array, log10, zeros
 
 
-# Function to extract data without using the AmietDataReader
-def get_frequency_data(fname, flist, frequency):
-    """Extracts the data for the frequency in the given index position.
+# Function to extract the data in the layout used by conventional_bf
+def get_frequency_data(fname, frequency):
+    """Extracts the data of a frequency, in any layout of the data file.
 
     Args:
+        fname (str): Name of the HDF5 file.
         frequency (float): Frequency to extract.
 
     Returns:
-        AmietFrequencyData: Object instance with the data of the frequency.
+        Tuple[np.ndarray, np.ndarray]: CSM, with shape (M, M), and steering
+            vector, with shape (M, N).
     """
-    f_pos = index_of_value(flist, frequency)
-    hdf = File(fname, "r")
-    fq = hdf.get("Frequency data")
-    freq_x = fq.get(f"freq_{f_pos}")
-    steering_vector = freq_x.get("steering_vector")[()]
-    raw_csm = freq_x.get("CSM")[()]
-    hdf.close()
-    return raw_csm, steering_vector
+    reader = AmietDataReader(fname)
+    data = reader.get_frequency_data(frequency)
+    reader.close()
+    return data.csm[1], data.steering_vector.T
 
 
 # Conventional beamforming algorithm
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the batched multi-frequency kernels of AmietDataGenerator.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+from time import perf_counter
+
+import acoular
+import amiet_tools as AmT
+import numpy as np
+from augen import AmietDataGenerator
+from augen.utils import frequency_by_kc
+
+# Airfoil geometry
+DARP2016Airfoil = AmT.loadAirfoilGeom("supplies\\DARP2016_AirfoilGeom.json")
+# Cconditions setup
+DARP2016Setup = AmT.loadTestSetup("supplies\\DARP2016_TestSetup.json")
+# Microphone array
+MicArray = acoular.MicGeom(from_file="supplies\\Spiral_MicArray.xml")
+# 40 frequencies, from kc = 0.5 to kc = 20
+frequencies = frequency_by_kc(
+    list(np.linspace(0.5, 20, 40)), DARP2016Airfoil.b, DARP2016Setup.c0
+)
+
+# Stages that build the transfer matrices, CSMs and steering vectors
+kernel_stages = ["transfer_block", "csm", "steering_vector"]
+
+results, elapsed, kernels = {}, {}, {}
+for batch_size in [1, 8, 16, 40]:
+    generator = AmietDataGenerator(
+        DARP2016Setup,
+        DARP2016Airfoil,
+        MicArray,
+        frequencies,
+        -0.49,
+        [0.65, 0.65],
+        [0.01, 0.01],
+        batch_size=batch_size,
+    )
+    generator._precompute()  # Frequency independent steps aren't measured
+    generator.timings = {}
+    start = perf_counter()
+    results[batch_size] = list(generator.iter_frequencies())
+    elapsed[batch_size] = perf_counter() - start
+    kernels[batch_size] = sum(generator.timings.get(k, 0) for k in kernel_stages)
+
+for batch_size, data in results.items():
+    # Largest relative difference to the per-frequency path
+    csm_error = max(
+        np.abs(d.csm - r.csm).max() / np.abs(r.csm).max()
+        for d, r in zip(data, results[1])
+    )
+    sv_error = max(
+        np.abs(d.steering_vector - r.steering_vector).max()
+        / np.abs(r.steering_vector).max()
+        for d, r in zip(data, results[1])
+    )
+    print(
+        f"batch_size = {batch_size:2d}: "
+        f"total {elapsed[batch_size]:7.2f} s "
+        f"({len(frequencies) / elapsed[batch_size]:6.2f} frequencies/s), "
+        f"kernels {kernels[batch_size]:7.2f} s "
+        f"({len(frequencies) / kernels[batch_size]:6.2f} frequencies/s, "
+        f"speedup = {kernels[1] / kernels[batch_size]:.2f}x), "
+        f"max. rel. difference: CSM {csm_error:.1e}, W {sv_error:.1e}"
+    )
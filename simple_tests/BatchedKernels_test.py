@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Batched kernels testing script, the batched transfer matrices and the data
+calculated in blocks of frequencies must match the per-frequency path over the
+whole frequency list.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+import acoular
+import amiet_tools as AmT
+import numpy as np
+from augen import AmietDataGenerator
+from augen.utils import dipole_shear_block, frequency_by_kc
+
+# Airfoil geometry
+DARP2016Airfoil = AmT.loadAirfoilGeom("supplies\\DARP2016_AirfoilGeom.json")
+# Cconditions setup
+DARP2016Setup = AmT.loadTestSetup("supplies\\DARP2016_TestSetup.json")
+# Microphone array
+MicArray = acoular.MicGeom(from_file="supplies\\Spiral_MicArray.xml")
+# 12 frequencies, from kc = 0.5 to kc = 20
+frequencies = frequency_by_kc(
+    list(np.linspace(0.5, 20, 12)), DARP2016Airfoil.b, DARP2016Setup.c0
+)
+
+
+def generator(batch_size):
+    """AmietDataGenerator of the test configuration."""
+    return AmietDataGenerator(
+        DARP2016Setup,
+        DARP2016Airfoil,
+        MicArray,
+        frequencies,
+        -0.49,
+        [0.65, 0.65],
+        [0.01, 0.01],
+        batch_size=batch_size,
+    )
+
+
+# Transfer matrices of the batched kernel and of amiet_tools, for every
+# frequency (the generator only checks one of them when it starts)
+batched = generator(len(frequencies))
+batched._precompute()
+c0 = DARP2016Setup.c0
+k0 = [2 * np.pi * f / c0 for f in frequencies]
+G_block = dipole_shear_block(batched._G0_fwd, batched._R_fwd, k0)
+for k, frequency in enumerate(frequencies):
+    G_ref = AmT.dipole_shear(
+        batched._XYZ_airfoil_calc,
+        batched._XYZ_array,
+        batched._XYZ_sl_fwd,
+        batched._T_sl_fwd,
+        k0[k],
+        c0,
+        batched._Mach,
+    )
+    np.testing.assert_allclose(
+        G_block[k], G_ref, rtol=1e-9, atol=1e-12 * np.abs(G_ref).max()
+    )
+print("The batched transfer matrices match dipole_shear at every frequency.")
+
+# Data of the whole frequency list, in blocks and one frequency at a time
+serial = list(generator(1).iter_frequencies())
+for batch_size in [5, len(frequencies)]:
+    data = list(generator(batch_size).iter_frequencies())
+    for d, r in zip(data, serial):
+        assert d.frequency == r.frequency
+        for x, y in ((d.csm, r.csm), (d.steering_vector, r.steering_vector)):
+            np.testing.assert_allclose(x, y, rtol=0, atol=1e-5 * np.abs(y).max())
+    print(f"batch_size = {batch_size}: the data matches the per-frequency path.")
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Beamforming filters testing script.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+import numpy as np
+from augen.utils import beamforming_filters
+
+rng = np.random.default_rng(0)
+# Transfer matrix with the size of a 64 mics array and a 66x66 scan grid
+G = rng.standard_normal((64, 66 * 66)) + 1j * rng.standard_normal((64, 66 * 66))
+
+# Column by column calculation (previous AmietDataGenerator implementation)
+W_loop = np.zeros((G.shape[0], G.shape[1]), "complex")
+for n in range(G.shape[1]):
+    W_loop[:, n] = G[:, n] / (np.linalg.norm(G[:, n], ord=2) ** 2)
+
+W = beamforming_filters(G)
+np.testing.assert_allclose(W, W_loop, rtol=1e-12, atol=0)
+# Same values after the precision used in the HDF5 file
+np.testing.assert_array_equal(W.astype(np.complex64), W_loop.astype(np.complex64))
+
+# In place calculation, as used by AmietDataGenerator
+G_copy = G.copy()
+W_in_place = beamforming_filters(G_copy, out=G_copy)
+assert W_in_place is G_copy
+np.testing.assert_array_equal(W_in_place, W)
+
+# Stack of transfer matrices (one per frequency)
+W_stack = beamforming_filters(np.stack([G, 2 * G]))
+np.testing.assert_allclose(W_stack[0], W_loop, rtol=1e-12, atol=0)
+np.testing.assert_allclose(W_stack[1], W_loop / 2, rtol=1e-12, atol=0)
+
+print("Beamforming filters are equal to the column by column calculation.")
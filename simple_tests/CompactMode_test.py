@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Compact mode testing script, the steering vectors rebuilt by AmietDataReader
+from a compact file must be equal to the stored ones.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+import acoular
+import amiet_tools as AmT
+import numpy as np
+from augen import AmietDataGenerator, AmietDataReader
+from augen.utils import frequency_by_kc
+
+# Airfoil geometry
+DARP2016Airfoil = AmT.loadAirfoilGeom("supplies\\DARP2016_AirfoilGeom.json")
+# Cconditions setup
+DARP2016Setup = AmT.loadTestSetup("supplies\\DARP2016_TestSetup.json")
+# Microphone array
+MicArray = acoular.MicGeom(from_file="supplies\\Spiral_MicArray.xml")
+frequencies = frequency_by_kc([5, 10, 20], DARP2016Airfoil.b, DARP2016Setup.c0)
+
+for compact in [False, True]:
+    AmietDataGenerator(
+        DARP2016Setup,
+        DARP2016Airfoil,
+        MicArray,
+        frequencies,
+        -0.49,
+        [0.65, 0.65],
+        [0.01, 0.01],
+        f"supplies\\Compact_{compact}",
+        mode="w",
+        compact=compact,
+    ).run()
+
+# Full grid, a region of interest and lazy reading
+for options in [{}, {"roi": (-0.2, 0.1, -0.3, 0.0)}, {"lazy": True}]:
+    stored = AmietDataReader("supplies\\Compact_False.h5", **options)
+    rebuilt = AmietDataReader("supplies\\Compact_True.h5", **options)
+    for frequency in stored.frequencies:
+        a = stored.get_frequency_data(frequency)
+        b = rebuilt.get_frequency_data(frequency)
+        assert np.array_equal(np.asarray(a.csm), np.asarray(b.csm))
+        assert np.array_equal(
+            np.asarray(a.steering_vector), np.asarray(b.steering_vector)
+        ), f"The rebuilt steering vector differs at {frequency} Hz ({options})."
+    stored.close()
+    rebuilt.close()
+    print(f"{options}: the rebuilt steering vectors are equal to the stored ones.")
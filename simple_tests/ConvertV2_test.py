@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Layout conversion testing script, a file converted by convert_to_v2 must give
+the same data as the original layout v1 file.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+from shutil import copyfile
+
+import h5py
+import numpy as np
+from augen import AmietDataReader, convert_to_v2
+
+
+def compare(v1_name, v2_name):
+    """Checks that both files give the same data."""
+    v1 = AmietDataReader(v1_name)
+    v2 = AmietDataReader(v2_name)
+    assert np.array_equal(v1.frequencies, v2.frequencies)
+    assert np.array_equal(v1.get_mic_array()[1], v2.get_mic_array()[1])
+    for frequency in v1.frequencies:
+        a = v1.get_frequency_data(frequency)
+        b = v2.get_frequency_data(frequency)
+        assert np.array_equal(a.csm, b.csm), f"CSMs differ at {frequency} Hz."
+        assert np.array_equal(
+            a.steering_vector, b.steering_vector
+        ), f"Steering vectors differ at {frequency} Hz."
+    v1.close()
+    v2.close()
+
+
+# Example file, saved with one freq_i group per frequency (layout v1)
+convert_to_v2(
+    "supplies\\AmietData_Spiral_MicArray.h5", "supplies\\Convert_Spiral_v2.h5"
+)
+compare("supplies\\AmietData_Spiral_MicArray.h5", "supplies\\Convert_Spiral_v2.h5")
+print("The converted file gives the same data as the layout v1 file.")
+
+# A layout v2 file can't be converted again
+try:
+    convert_to_v2("supplies\\Convert_Spiral_v2.h5", "supplies\\Convert_again.h5")
+except ValueError as error:
+    print(f"Converting a layout v2 file: {error}")
+else:
+    raise AssertionError("A layout v2 file was converted again.")
+
+# A missing freq_i group (interrupted run) must raise ValueError, in both files
+copyfile("supplies\\AmietData_Spiral_MicArray.h5", "supplies\\Convert_missing.h5")
+with h5py.File("supplies\\Convert_missing.h5", "a") as hdf:
+    del hdf["Frequency data"]["freq_1"]
+convert_to_v2("supplies\\Convert_missing.h5", "supplies\\Convert_missing_v2.h5")
+for file_name in ["supplies\\Convert_missing.h5", "supplies\\Convert_missing_v2.h5"]:
+    reader = AmietDataReader(file_name)
+    try:
+        reader.get_frequency_data(reader.frequencies[1])
+    except ValueError as error:
+        print(f"{file_name}: {error}")
+    else:
+        raise AssertionError(f"The missing frequency was read from {file_name}.")
+    reader.get_frequency_data(reader.frequencies[0])
+    reader.close()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+AmietDataCache testing script, the configuration keys, the misses and hits,
+the index of the cached files, the copies (link=True) and the eviction.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+from filecmp import cmp
+from os.path import isfile, samefile
+
+import acoular
+import amiet_tools as AmT
+from augen import AmietDataCache, AmietDataGenerator, AmietDataReader
+from augen.utils import frequency_by_kc
+
+# Airfoil geometry
+DARP2016Airfoil = AmT.loadAirfoilGeom("supplies\\DARP2016_AirfoilGeom.json")
+# Cconditions setup
+DARP2016Setup = AmT.loadTestSetup("supplies\\DARP2016_TestSetup.json")
+# Microphone array
+MicArray = acoular.MicGeom(from_file="supplies\\Spiral_MicArray.xml")
+frequencies = frequency_by_kc([5, 10], DARP2016Airfoil.b, DARP2016Setup.c0)
+
+
+def generator(frequencies, **kwargs):
+    """AmietDataGenerator of the test configuration."""
+    return AmietDataGenerator(
+        DARP2016Setup,
+        DARP2016Airfoil,
+        MicArray,
+        frequencies,
+        -0.49,
+        [0.65, 0.65],
+        [0.01, 0.01],
+        "supplies\\Cache_test",
+        **kwargs,
+    )
+
+
+cache = AmietDataCache("supplies\\AmietDataCache")
+cache.purge()
+
+# Same configuration, same key; other frequencies or options, other keys
+key = cache.key(generator(frequencies))
+assert cache.key(generator(list(frequencies))) == key
+assert cache.key(generator(frequencies[:1])) != key
+assert cache.key(generator(frequencies, csm_format="packed")) != key
+assert cache.key(generator(frequencies, steps=True)) == key
+print("The keys only depend on the configuration.")
+
+# A miss generates the file, a hit on a new generator only returns it
+first = generator(frequencies)
+file_name = cache.get(first)
+assert first.timings, "The miss didn't run the generator."
+assert [entry["hits"] for entry in cache.entries()] == [0]
+second = generator(frequencies)
+assert cache.get(second) == file_name
+assert not getattr(second, "timings", None), "The hit ran the generator."
+assert [entry["hits"] for entry in cache.entries()] == [1]
+reader = AmietDataReader(file_name)
+assert len(reader.frequencies) == len(frequencies)
+reader.close()
+print("A miss generates the file, and the next call is a hit.")
+
+# link=True gives an independent copy named after the generator
+cache.get(generator(frequencies), link=True)
+assert isfile("supplies\\Cache_test.h5")
+assert cmp(file_name, "supplies\\Cache_test.h5", shallow=False)
+assert not samefile(file_name, "supplies\\Cache_test.h5")
+print("The cached file is copied to the data_name of the generator.")
+
+# The index is saved in the folder, entries from the most recently used
+other = cache.get(generator(frequencies[:1]))
+entries = AmietDataCache("supplies\\AmietDataCache").entries()
+assert [entry["path"] for entry in entries] == [other, file_name]
+assert cache.size() == sum(entry["size"] for entry in entries)
+
+# Eviction of the least recently used files down to max_size
+cache.get(generator(frequencies))
+cache.max_size = entries[1]["size"]
+cache.evict()
+assert [entry["path"] for entry in cache.entries()] == [file_name]
+assert not isfile(other) and cache.size() <= cache.max_size
+cache.purge()
+assert cache.entries() == [] and not isfile(file_name)
+print("The least recently used files are evicted.")
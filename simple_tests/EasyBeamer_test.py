@@ -27,3 +27,18 @@ for i in range(len(teste.frequencies)):
     beam_i = EasyBeamer(teste, 128, True, -93.98)
     level_i = beam_i.get_beamforming(frequency)
     simple_plot(ageom.b, ageom.d, title, level_i, beam_i.grid, dr[i])
+
+
+# Same beamformings, with the data of the next frequency read in the background
+# while the current one is beamformed. EasyBeamer reads through the reader, so
+# the prefetched frequencies are taken from its cache.
+teste = AmietDataReader(
+    "supplies\\AmietData_Spiral_MicArray.h5", cache_bytes=64 * 2**20
+)
+beam = EasyBeamer(teste, 128, True, -93.98)
+for freq_i in teste.iter_frequency_data(prefetch=1):
+    level_i = beam.get_beamforming(freq_i.frequency)
+
+print(
+    f"Reading time hidden by the prefetching: {teste.timings['prefetch_hidden']:.3f} s"
+)
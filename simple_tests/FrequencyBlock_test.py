@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Frequency block testing script, the CSMs and steering vectors read by
+AmietDataReader.get_frequency_block must be the ones of the per-frequency
+reads, in both layouts and with given buffers.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+import numpy as np
+from augen import AmietDataReader, convert_to_v2
+
+# Example file (layout v1) and its layout v2 conversion
+convert_to_v2("supplies\\AmietData_Spiral_MicArray.h5", "supplies\\Block_Spiral_v2.h5")
+
+for file_name in [
+    "supplies\\AmietData_Spiral_MicArray.h5",
+    "supplies\\Block_Spiral_v2.h5",
+]:
+    reader = AmietDataReader(file_name)
+    frequencies = list(reader.frequencies)
+    data = {f: reader.get_frequency_data(f) for f in frequencies}
+    N, M = data[frequencies[0]].steering_vector.shape
+
+    # All the frequencies, consecutive ones and others in any order
+    for selection in [None, frequencies[1:], frequencies[::-1], frequencies[::2]]:
+        csm, steering_vector = reader.get_frequency_block(selection)
+        for k, frequency in enumerate(frequencies if selection is None else selection):
+            assert np.array_equal(csm[k], data[frequency].csm[1])
+            assert np.array_equal(steering_vector[k], data[frequency].steering_vector)
+
+    # Given buffers are filled in place and returned
+    out = (
+        np.zeros((len(frequencies), M, M), dtype=np.complex64),
+        np.zeros((len(frequencies), N, M), dtype=np.complex64),
+    )
+    block = reader.get_frequency_block(frequencies, out=out)
+    assert block[0] is out[0] and block[1] is out[1]
+    for k, frequency in enumerate(frequencies):
+        assert np.array_equal(out[0][k], data[frequency].csm[1])
+        assert np.array_equal(out[1][k], data[frequency].steering_vector)
+
+    # Buffers with other shapes, types or strides are refused
+    for wrong in [
+        (out[0][:1], out[1]),
+        (out[0].astype(np.complex128), out[1]),
+        (out[0], np.zeros((len(frequencies), M, N), dtype=np.complex64).swapaxes(1, 2)),
+    ]:
+        try:
+            reader.get_frequency_block(frequencies, out=wrong)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("A wrong buffer was accepted.")
+    reader.close()
+    print(f"{file_name}: the block reads match the per-frequency reads.")
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+FrequencyIndex testing script, the lookups with tolerances, the nearest
+frequency, the frequency bands and the misses.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+from augen.utils import FrequencyIndex
+
+# Frequencies in the (unsorted) order of a data file
+frequencies = [2000.0, 900.0, 1000.0, 1200.0, 800.0, 1100.0, 50000.0]
+index = FrequencyIndex(frequencies)
+
+# Lookups give the positions in the data file, within the tolerances
+assert index.lookup(1000.0) == 2
+assert index.lookup(1000.004) == 2  # atol, 0.01 Hz
+assert index.lookup(50000.03) == 6  # rtol, 1e-6 * 50000 Hz + atol
+assert 999.995 in index and 1000.02 not in index
+assert 50000.07 not in index
+print("Lookups within the tolerances work.")
+
+# Misses raise ValueError, also for None (e.g. a missing frequency argument)
+for frequency in [1000.02, 10.0, 1e6, None]:
+    assert frequency not in index
+    try:
+        index.lookup(frequency)
+    except ValueError as error:
+        print(f"{frequency}: {error}")
+    else:
+        raise AssertionError(f"{frequency} was found in the index.")
+
+# Tighter tolerances
+strict = FrequencyIndex(frequencies, rtol=0, atol=1e-6)
+assert 1000.0 in strict and 1000.004 not in strict
+
+# Nearest frequency, even far from the stored ones
+assert index.nearest(1040.0) == 2
+assert index.nearest(1060.0) == 5
+assert index.nearest(10.0) == 4
+assert index.nearest(1e6) == 6
+print("The nearest frequencies are found.")
+
+# Frequency bands (as in Acoular), positions in increasing frequency
+assert index.band(1000.0, 3) == [1, 2, 5]  # 890.9 to 1122.5 Hz
+assert index.band(1000.0, 1) == [4, 1, 2, 5, 3]  # 707.1 to 1414.2 Hz
+assert index.band(1000.004, 0) == [2]
+assert index.band(1050.0, 0) == []
+assert index.band(10.0, 3) == []
+print("The frequency bands are found.")
+
+# Empty index
+empty = FrequencyIndex([])
+assert len(empty) == 0 and 1000.0 not in empty
+try:
+    empty.lookup(1000.0)
+except ValueError:
+    print("An empty index has no frequencies.")
+else:
+    raise AssertionError("A frequency was found in an empty index.")
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy reading testing script, the tiled beamforming of a lazy AmietDataReader
+must never load the full steering vector of a default layout file.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+import tracemalloc
+
+import acoular
+import amiet_tools as AmT
+import numpy as np
+from augen import AmietDataGenerator, AmietDataReader
+from augen.utils import beamforming_map, frequency_by_kc
+
+# Airfoil geometry
+DARP2016Airfoil = AmT.loadAirfoilGeom("supplies\\DARP2016_AirfoilGeom.json")
+# Cconditions setup
+DARP2016Setup = AmT.loadTestSetup("supplies\\DARP2016_TestSetup.json")
+# Microphone array
+MicArray = acoular.MicGeom(from_file="supplies\\Spiral_MicArray.xml")
+frequencies = frequency_by_kc([10], DARP2016Airfoil.b, DARP2016Setup.c0)
+tile_size = 1024
+
+# Default storage options (layout v2, one chunk per frequency), with a fine
+# grid, so the steering vector is much larger than a tile.
+AmietDataGenerator(
+    DARP2016Setup,
+    DARP2016Airfoil,
+    MicArray,
+    frequencies,
+    -0.49,
+    [0.65, 0.65],
+    [0.005, 0.005],
+    "supplies\\LazyTiles_test",
+    mode="w",
+).run()
+
+eager = AmietDataReader("supplies\\LazyTiles_test.h5").get_frequency_data(
+    frequencies[0]
+)
+lazy_reader = AmietDataReader("supplies\\LazyTiles_test.h5", lazy=True)
+lazy = lazy_reader.get_frequency_data(frequencies[0])
+full_bytes = lazy.steering_vector.nbytes
+
+# A single tile, and the whole tiled map
+tracemalloc.start()
+tile = lazy.steering_vector[:tile_size]
+tile_peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.reset_peak()
+pressure = beamforming_map(lazy.csm[1], lazy.steering_vector, tile_size)
+map_peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+
+print(f"Steering vector: {full_bytes / 2**20:.2f} MiB")
+print(f"Peak of a tile read: {tile_peak / 2**20:.2f} MiB")
+print(f"Peak of the tiled map: {map_peak / 2**20:.2f} MiB")
+assert tile_peak < full_bytes / 4, "A tile read loaded the full steering vector."
+assert map_peak < full_bytes / 2, "The tiled map loaded the full steering vector."
+
+# Same results as the eager data
+assert np.array_equal(tile, eager.steering_vector[:tile_size])
+np.testing.assert_allclose(
+    pressure, beamforming_map(eager.csm[1], eager.steering_vector), rtol=1e-5
+)
+lazy_reader.close()
+print("The tiles of the lazy reader are bounded and match the eager data.")
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Factorized (low-rank) CSM testing script.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+import acoular
+import amiet_tools as AmT
+import numpy as np
+from augen import AmietDataGenerator
+from augen.utils import frequency_by_kc, low_rank_factor
+
+# Low-rank factor of a synthetic source CSM: 12 components and a noise floor.
+rng = np.random.default_rng(0)
+V = rng.standard_normal((2000, 12)) + 1j * rng.standard_normal((2000, 12))
+A = (V * np.exp(-np.arange(12))) @ V.conj().T + 1e-6 * np.eye(2000)
+for energy in [0.99, 0.999, 0.9999]:
+    L, captured = low_rank_factor(A, energy=energy)
+    residual = A - L @ L.conj().T
+    # The residual is positive semi-definite, so its trace is the error.
+    np.testing.assert_allclose(
+        1 - captured, np.trace(residual).real / np.trace(A).real, rtol=1e-6
+    )
+    assert captured >= energy and L.shape[1] <= 12
+
+# Airfoil geometry
+DARP2016Airfoil = AmT.loadAirfoilGeom("supplies\\DARP2016_AirfoilGeom.json")
+# Cconditions setup
+DARP2016Setup = AmT.loadTestSetup("supplies\\DARP2016_TestSetup.json")
+# Microphone array
+MicArray = acoular.MicGeom(from_file="supplies\\Spiral_MicArray.xml")
+frequencies = frequency_by_kc([5, 10, 20], DARP2016Airfoil.b, DARP2016Setup.c0)
+
+
+def generate(**kwargs):
+    """Generates the data of all frequencies in memory, with the given
+    options, and measures the time spent on the CSMs."""
+    generator = AmietDataGenerator(
+        DARP2016Setup,
+        DARP2016Airfoil,
+        MicArray,
+        frequencies,
+        -0.49,
+        [0.65, 0.65],
+        [0.01, 0.01],
+        **kwargs,
+    )
+    data = list(generator.iter_frequencies())
+    return data, generator.timings["csm"]
+
+
+full, full_time = generate()
+for energy in [0.99, 0.999, 0.9999]:
+    factorized, factorized_time = generate(csm_energy=energy)
+    for f, d in zip(full, factorized):
+        error = np.linalg.norm(d.csm[1] - f.csm[1]) / np.linalg.norm(f.csm[1])
+        print(
+            f"{f.frequency} Hz, energy = {energy}: rank = {d.csm_factor.shape[1]}, "
+            f"captured energy = {d.captured_energy:.5f}, CSM rel. error = {error:.1e}"
+        )
+        assert d.captured_energy >= energy
+    print(f"CSM time: full {full_time:.2f} s, factorized {factorized_time:.2f} s")
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Packed CSM testing script, the round trip of pack_hermitian/unpack_hermitian
+and the reading of files saved with csm_format="packed".
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+import acoular
+import amiet_tools as AmT
+import numpy as np
+from augen import AmietDataGenerator, AmietDataReader
+from augen.utils import frequency_by_kc, pack_hermitian, unpack_hermitian
+
+# Round trip of a random Hermitian matrix
+rng = np.random.default_rng(0)
+M = 64
+X = rng.standard_normal((M, M)) + 1j * rng.standard_normal((M, M))
+A = (X @ X.conj().T).astype(np.complex64)
+packed = pack_hermitian(A)
+assert packed.shape == (M * (M + 1) // 2,)
+assert np.array_equal(unpack_hermitian(packed), A)
+buffer = np.zeros((2, M, M), dtype=np.complex64)
+unpack_hermitian(packed, out=buffer[1])
+assert np.array_equal(buffer[1], A)
+print("pack_hermitian/unpack_hermitian round trip is exact.")
+
+# Airfoil geometry
+DARP2016Airfoil = AmT.loadAirfoilGeom("supplies\\DARP2016_AirfoilGeom.json")
+# Cconditions setup
+DARP2016Setup = AmT.loadTestSetup("supplies\\DARP2016_TestSetup.json")
+# Microphone array
+MicArray = acoular.MicGeom(from_file="supplies\\Spiral_MicArray.xml")
+frequencies = frequency_by_kc([5, 10, 20], DARP2016Airfoil.b, DARP2016Setup.c0)
+
+for csm_format in ["full", "packed"]:
+    AmietDataGenerator(
+        DARP2016Setup,
+        DARP2016Airfoil,
+        MicArray,
+        frequencies,
+        -0.49,
+        [0.65, 0.65],
+        [0.01, 0.01],
+        f"supplies\\PackedCSM_{csm_format}",
+        mode="w",
+        csm_format=csm_format,
+    ).run()
+
+full = AmietDataReader("supplies\\PackedCSM_full.h5")
+packed = AmietDataReader("supplies\\PackedCSM_packed.h5")
+upper = np.triu_indices(MicArray.num_mics)
+for frequency in full.frequencies:
+    a = full.get_frequency_data(frequency)
+    b = packed.get_frequency_data(frequency)
+    # The stored upper triangle is the same, the lower one is its conjugate
+    assert np.array_equal(a.csm[1][upper], b.csm[1][upper])
+    np.testing.assert_allclose(
+        b.csm[1], a.csm[1], rtol=0, atol=1e-6 * np.abs(a.csm[1]).max()
+    )
+    assert np.array_equal(a.steering_vector, b.steering_vector)
+full.close()
+packed.close()
+print("The packed CSMs read by AmietDataReader match the full ones.")
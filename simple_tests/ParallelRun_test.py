@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel run testing script, the data calculated with several worker processes
+must be bit-identical to the serial run.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+import acoular
+import amiet_tools as AmT
+import numpy as np
+from augen import AmietDataGenerator, AmietDataReader
+from augen.utils import frequency_by_kc
+
+# Airfoil geometry
+DARP2016Airfoil = AmT.loadAirfoilGeom("supplies\\DARP2016_AirfoilGeom.json")
+# Cconditions setup
+DARP2016Setup = AmT.loadTestSetup("supplies\\DARP2016_TestSetup.json")
+# Microphone array
+MicArray = acoular.MicGeom(from_file="supplies\\Spiral_MicArray.xml")
+frequencies = frequency_by_kc([5, 10, 20, 30], DARP2016Airfoil.b, DARP2016Setup.c0)
+
+
+# The workers are new processes, which import this script on Windows
+if __name__ == "__main__":
+    for workers in [1, 2]:
+        AmietDataGenerator(
+            DARP2016Setup,
+            DARP2016Airfoil,
+            MicArray,
+            frequencies,
+            -0.49,
+            [0.65, 0.65],
+            [0.01, 0.01],
+            f"supplies\\Parallel_workers_{workers}",
+            mode="w",
+        ).run(workers=workers)
+
+    serial = AmietDataReader("supplies\\Parallel_workers_1.h5")
+    parallel = AmietDataReader("supplies\\Parallel_workers_2.h5")
+    assert np.array_equal(serial.frequencies, parallel.frequencies)
+    for frequency in serial.frequencies:
+        a = serial.get_frequency_data(frequency)
+        b = parallel.get_frequency_data(frequency)
+        assert np.array_equal(a.csm, b.csm), f"CSMs differ at {frequency} Hz."
+        assert np.array_equal(
+            a.steering_vector, b.steering_vector
+        ), f"Steering vectors differ at {frequency} Hz."
+    serial.close()
+    parallel.close()
+    print("The run with 2 workers is bit-identical to the serial run.")
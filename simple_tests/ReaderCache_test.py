@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+AmietDataReader cache testing script, the cache must stay within cache_bytes,
+drop the least recently used frequencies and count the hits and misses.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+import numpy as np
+from augen import AmietDataReader
+
+
+def nbytes(data):
+    """Size of the cached arrays of a frequency."""
+    return data.steering_vector.nbytes + data.csm.nbytes
+
+
+file_name = "supplies\\AmietData_Spiral_MicArray.h5"
+f0, f1, f2 = AmietDataReader(file_name).frequencies[:3]
+size = nbytes(AmietDataReader(file_name).get_frequency_data(f0))
+
+# Room for two frequencies
+reader = AmietDataReader(file_name, cache_bytes=2 * size)
+first = reader.get_frequency_data(f0)
+assert reader.get_frequency_data(f0) is first  # Hit, the same object
+reader.get_frequency_data(f1)
+assert (reader.cache_hits, reader.cache_misses) == (1, 2)
+assert reader._cache_size == 2 * size
+
+# f0 is used again, so f1 is the least recently used one and is dropped
+reader.get_frequency_data(f0)
+reader.get_frequency_data(f2)
+assert reader._cache_size == 2 * size
+assert (reader.cache_hits, reader.cache_misses) == (2, 3)
+reader.get_frequency_data(f0)
+reader.get_frequency_data(f2)
+assert (reader.cache_hits, reader.cache_misses) == (4, 3)
+reader.get_frequency_data(f1)
+assert (reader.cache_hits, reader.cache_misses) == (4, 4)
+print("The least recently used frequencies are dropped.")
+
+# The prefetching thread and the caller share the cache, without counting a
+# frequency twice
+for data in reader.iter_frequency_data(prefetch=2):
+    assert np.array_equal(reader.get_frequency_data(data.frequency).csm, data.csm)
+    assert reader._cache_size <= 2 * size
+assert reader._cache_size == sum(nbytes(d) for d, _ in reader._cache.values())
+print("The prefetching thread keeps the cache within cache_bytes.")
+
+# Frequencies larger than the budget are never cached
+small = AmietDataReader(file_name, cache_bytes=size - 1)
+small.get_frequency_data(f0)
+small.get_frequency_data(f0)
+assert (small.cache_hits, small.cache_misses, small._cache_size) == (0, 2, 0)
+
+# Clearing the cache resets the counters, and the data is read again
+reader.clear_cache()
+assert (reader.cache_hits, reader.cache_misses, reader._cache_size) == (0, 0, 0)
+assert reader.get_frequency_data(f0) is not first
+assert np.array_equal(reader.get_frequency_data(f0).csm, first.csm)
+reader.close()
+small.close()
+print("The cache stays within cache_bytes.")
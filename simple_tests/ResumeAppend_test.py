@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Resume and append testing script, including the check of the storage options
+of the existing file (its layout is always kept).
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+import acoular
+import amiet_tools as AmT
+import numpy as np
+import h5py
+from augen import AmietDataGenerator, AmietDataReader
+from augen.utils import frequency_by_kc
+
+# Airfoil geometry
+DARP2016Airfoil = AmT.loadAirfoilGeom("supplies\\DARP2016_AirfoilGeom.json")
+# Cconditions setup
+DARP2016Setup = AmT.loadTestSetup("supplies\\DARP2016_TestSetup.json")
+# Microphone array
+MicArray = acoular.MicGeom(from_file="supplies\\Spiral_MicArray.xml")
+frequencies = frequency_by_kc([5, 10, 20], DARP2016Airfoil.b, DARP2016Setup.c0)
+
+
+def generator(data_name, frequencies, **kwargs):
+    """AmietDataGenerator of the test configuration."""
+    return AmietDataGenerator(
+        DARP2016Setup,
+        DARP2016Airfoil,
+        MicArray,
+        frequencies,
+        -0.49,
+        [0.65, 0.65],
+        [0.01, 0.01],
+        data_name,
+        **kwargs,
+    )
+
+
+# Reference file, with all the frequencies in a single run
+generator("supplies\\Resume_reference", frequencies, mode="w").run()
+reference = AmietDataReader("supplies\\Resume_reference.h5")
+
+for options in [{}, {"compact": True}, {"csm_format": "packed"}, {"layout": 1}]:
+    data_name = "supplies\\Resume_test"
+    generator(data_name, frequencies[:2], mode="w", **options).run()
+
+    # Appending with other storage options must fail, leaving the file as is
+    for name, value in [("compact", True), ("csm_format", "packed")]:
+        if options.get(name) == value:
+            value = {"compact": False, "csm_format": "full"}[name]
+        changed = dict(options, **{name: value})
+        try:
+            generator(data_name, frequencies, mode="append", **changed).run()
+        except ValueError as error:
+            print(f"{options} appended with {changed}: {error}")
+        else:
+            raise AssertionError(f"{changed} was accepted for a {options} file.")
+        assert len(AmietDataReader(f"{data_name}.h5").frequencies) == 2
+
+    # Appending and resuming with the same options, but the other layout
+    layout = 2 if options.get("layout") == 1 else 1
+    changed = dict(options, layout=layout)
+    generator(data_name, frequencies, mode="append", **changed).run()
+    generator(data_name, frequencies, mode="resume", **changed).run()
+    with h5py.File(f"{data_name}.h5", "r") as hdf:
+        stored_layout = hdf["Frequency data"].attrs.get("layout_version", 1)
+    assert stored_layout == options.get("layout", 2), "The layout was changed."
+    appended = AmietDataReader(f"{data_name}.h5")
+    assert len(appended.frequencies) == len(frequencies)
+    for frequency in frequencies:
+        a = appended.get_frequency_data(frequency)
+        b = reference.get_frequency_data(frequency)
+        for x, y in ((a.csm, b.csm), (a.steering_vector, b.steering_vector)):
+            np.testing.assert_allclose(x, y, rtol=0, atol=1e-5 * np.abs(y).max())
+    appended.close()
+    print(f"{options}: appended file matches the single run.")
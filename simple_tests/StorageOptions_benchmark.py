@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the HDF5 storage options (chunks, compression, shuffle and
+checksums) of AmietDataGenerator, for the two example arrays.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+from os.path import getsize
+from time import perf_counter
+
+import acoular
+import amiet_tools as AmT
+from augen import AmietDataGenerator, AmietDataReader
+from augen.utils import frequency_by_kc
+
+# Airfoil geometry
+DARP2016Airfoil = AmT.loadAirfoilGeom("supplies\\DARP2016_AirfoilGeom.json")
+# Cconditions setup
+DARP2016Setup = AmT.loadTestSetup("supplies\\DARP2016_TestSetup.json")
+# Microphone arrays
+MicArrays = {
+    "Spiral": acoular.MicGeom(from_file="supplies\\Spiral_MicArray.xml"),
+    "Circular": acoular.MicGeom(from_file="supplies\\Circular_MicArray.xml"),
+}
+frequencies = frequency_by_kc([5, 10, 20], DARP2016Airfoil.b, DARP2016Setup.c0)
+
+# Storage options to be compared. Layout v2 files (the default) save the
+# steering vectors in chunks of 1024 scan points, layout v1 files without
+# filters are not chunked.
+storage = {
+    "v1 contiguous": {"layout": 1},
+    "v2 chunks of 1024 points": {},
+    "v2 chunks of 4096 points": {"chunk_points": 4096},
+    "lzf": {"compression": "lzf"},
+    "lzf+shuffle": {"compression": "lzf", "shuffle": True},
+    "gzip+shuffle": {"compression": "gzip", "compression_opts": 4, "shuffle": True},
+    "gzip+shuffle+fletcher32": {
+        "compression": "gzip",
+        "compression_opts": 4,
+        "shuffle": True,
+        "fletcher32": True,
+    },
+}
+
+for array_name, MicArray in MicArrays.items():
+    print(f"{array_name} array:")
+    for label, options in storage.items():
+        file_name = f"supplies\\Storage_{array_name}_{label.replace(' ', '_')}"
+        generator = AmietDataGenerator(
+            DARP2016Setup,
+            DARP2016Airfoil,
+            MicArray,
+            frequencies,
+            -0.49,
+            [0.65, 0.65],
+            [0.01, 0.01],
+            file_name,
+            mode="w",
+            **options,
+        )
+        # Only the time spent writing the frequency data is measured
+        generator.run()
+        write_time = generator.timings["write"]
+
+        reader = AmietDataReader(f"{file_name}.h5")
+        start = perf_counter()
+        data = [reader.get_frequency_data(f) for f in reader.frequencies]
+        read_time = perf_counter() - start
+        data_bytes = sum(d.steering_vector.nbytes + d.csm[1].nbytes for d in data)
+        reader.close()
+
+        print(
+            f"    {label:>24}: "
+            f"size {getsize(f'{file_name}.h5') / 1e6:8.1f} MB, "
+            f"write {data_bytes / 1e6 / write_time:8.1f} MB/s, "
+            f"read {data_bytes / 1e6 / read_time:8.1f} MB/s"
+        )
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Sweep generator testing script, each point of an AmietSweepGenerator must give
+the same data as an AmietDataGenerator with the TestSetup of the point.
+=================
+@Author: Michael Markus Ackermann
+"""
+
+# Import needed libraries/modules/packages
+import acoular
+import amiet_tools as AmT
+import numpy as np
+from augen import AmietDataGenerator, AmietDataReader, AmietSweepGenerator
+from augen.data import _vary_test_setup
+from augen.utils import frequency_by_kc
+
+# Airfoil geometry
+DARP2016Airfoil = AmT.loadAirfoilGeom("supplies\\DARP2016_AirfoilGeom.json")
+# Cconditions setup
+DARP2016Setup = AmT.loadTestSetup("supplies\\DARP2016_TestSetup.json")
+# Microphone array
+MicArray = acoular.MicGeom(from_file="supplies\\Spiral_MicArray.xml")
+frequencies = frequency_by_kc([5, 10], DARP2016Airfoil.b, DARP2016Setup.c0)
+arguments = (-0.49, [0.65, 0.65], [0.01, 0.01])
+
+# The changed copy of the TestSetup updates the flow, not the original one
+Ux, Mach = DARP2016Setup.Ux, DARP2016Setup.Mach
+setup = _vary_test_setup(DARP2016Setup, {"Ux": 2 * Ux, "turb_intensity": 0.03})
+assert (setup.Ux, setup.turb_intensity) == (2 * Ux, 0.03)
+assert np.isclose(setup.Mach, 2 * Ux / setup.c0)
+assert np.isclose(setup.beta, np.sqrt(1 - setup.Mach**2))
+assert (DARP2016Setup.Ux, DARP2016Setup.Mach) == (Ux, Mach)
+print("_vary_test_setup changes a copy of the TestSetup.")
+
+# Two flows (Ux), each one with two turbulence intensities
+sweep = AmietSweepGenerator(
+    DARP2016Setup,
+    DARP2016Airfoil,
+    MicArray,
+    frequencies,
+    *arguments,
+    {"Ux": [40, 60], "turb_intensity": [0.02, 0.03]},
+    "supplies\\Sweep_test",
+    options={"mode": "w"},
+)
+sweep.run()
+assert len(sweep.points) == 4
+# The source CSMs are released after each frequency
+assert all(generator._Sqq is None for generator in sweep.generators)
+
+for k, point in enumerate(sweep.points):
+    AmietDataGenerator(
+        _vary_test_setup(DARP2016Setup, point),
+        DARP2016Airfoil,
+        MicArray,
+        frequencies,
+        *arguments,
+        "supplies\\Sweep_single",
+        mode="w",
+    ).run()
+    swept = AmietDataReader(f"supplies\\Sweep_test_{k}.h5")
+    single = AmietDataReader("supplies\\Sweep_single.h5")
+    for frequency in frequencies:
+        a = swept.get_frequency_data(frequency)
+        b = single.get_frequency_data(frequency)
+        for x, y in ((a.csm, b.csm), (a.steering_vector, b.steering_vector)):
+            np.testing.assert_allclose(x, y, rtol=0, atol=1e-6 * np.abs(y).max())
+    swept.close()
+    single.close()
+    print(f"{point}: the sweep point matches a single generator.")